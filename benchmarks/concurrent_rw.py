@@ -0,0 +1,111 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, StorageProfile
+
+READ_SQL = 'SELECT * FROM quiz_logs WHERE guild_id = ? ORDER BY timestamp DESC LIMIT 50'
+WRITE_SQL = '''
+    INSERT INTO quiz_logs (guild_id, user_id, quiz_id, score, total_questions, passed)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+class LegacyConnections:
+    # The previous setup: one default connection per thread, rollback journal
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+
+    def get(self):
+        if not hasattr(self.local, 'conn'):
+            self.local.conn = sqlite3.connect(self.path)
+        return self.local.conn
+
+    def read(self, guild_id: int):
+        return self.get().execute(READ_SQL, (guild_id,)).fetchall()
+
+    def write(self, user_id: int):
+        conn = self.get()
+        conn.execute(WRITE_SQL, (1, user_id, 1, 5, 10, True))
+        conn.commit()
+
+
+class PooledConnections:
+    def __init__(self, database: Database):
+        self.pool = database.pool
+
+    def read(self, guild_id: int):
+        with self.pool.reader() as conn:
+            return conn.execute(READ_SQL, (guild_id,)).fetchall()
+
+    def write(self, user_id: int):
+        with self.pool.writer() as conn:
+            conn.execute(WRITE_SQL, (1, user_id, 1, 5, 10, True))
+            conn.commit()
+
+
+def hammer(target, readers: int, writers: int, duration: float):
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def loop(kind: str):
+        done = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                if kind == 'reads':
+                    target.read(1)
+                else:
+                    target.write(done)
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts[kind] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=loop, args=('reads',)) for _ in range(readers)]
+    threads += [threading.Thread(target=loop, args=('writes',)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write throughput, legacy vs pooled connections.")
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('legacy', 'pooled'):
+            path = os.path.join(tmp, f'{name}.db')
+            profile = StorageProfile() if name == 'pooled' else StorageProfile(journal_mode='DELETE', synchronous='FULL', mmap_size=0, cache_size=-2000)
+            database = Database(path, readers=args.readers, profile=profile)
+            with database.pool.writer() as conn:
+                conn.executemany(WRITE_SQL, [(1, i, 1, 5, 10, True) for i in range(args.rows)])
+                conn.commit()
+
+            target = PooledConnections(database) if name == 'pooled' else LegacyConnections(path)
+            counts = hammer(target, args.readers, args.writers, args.duration)
+            database.close()
+            print(
+                f"{name:>6}: {counts['reads'] / args.duration:9.0f} reads/s "
+                f"{counts['writes'] / args.duration:8.0f} writes/s "
+                f"{counts['errors']} lock errors"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, AsyncDatabase
+
+
+async def monitor_lag(samples: list, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+# Attempts and log channels are served from the write-behind buffer and the
+# guild cache, so time calls that still reach SQLite: a quiz insert on the
+# writer and an uncached read of the guild's recent logs.
+QUESTIONS = [{'question': f'Q{i}', 'options': ['A', 'B', 'C', 'D'], 'correct_answers': [1]} for i in range(10)]
+
+
+async def fake_request_sync(database: Database):
+    database.save_quiz(1, QUESTIONS, 1234, 70)
+    database.get_quiz_logs(1)
+    await asyncio.sleep(0)
+
+
+async def fake_request_async(database: AsyncDatabase):
+    await database.save_quiz(1, QUESTIONS, 1234, 70)
+    await database.get_quiz_logs(1)
+
+
+async def run(mode: str, path: str, users: int):
+    database = Database(path)
+    for user_id in range(200):
+        database.log_quiz_attempt(1, user_id, 1, 7, 10, True)
+    database.attempt_log.flush()
+    async_database = AsyncDatabase(database)
+    samples = []
+    monitor = asyncio.create_task(monitor_lag(samples))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    if mode == "sync":
+        await asyncio.gather(*(fake_request_sync(database) for _ in range(users)))
+    else:
+        await asyncio.gather(*(fake_request_async(async_database) for _ in range(users)))
+    elapsed = time.perf_counter() - start
+
+    await asyncio.sleep(0.05)
+    monitor.cancel()
+    async_database.close()
+
+    samples.sort()
+    worst = samples[-1] * 1000 if samples else 0.0
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1000 if samples else 0.0
+    print(f"{mode:>5}: {users} requests in {elapsed:.2f}s | loop lag max {worst:.1f}ms p99 {p99:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop lag caused by database calls.")
+    parser.add_argument("--users", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("sync", "async"):
+            asyncio.run(run(mode, os.path.join(tmp, f"{mode}.db"), args.users))
+
+
+if __name__ == "__main__":
+    main()
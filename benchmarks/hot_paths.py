@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing database opens the module-level db from ROLEVIA_DB, so point it at a
+# scratch file instead of rolevia.db in the working directory
+SCRATCH = tempfile.mkdtemp(prefix='rolevia-bench-')
+os.environ['ROLEVIA_DB'] = os.path.join(SCRATCH, 'rolevia.db')
+os.environ.pop('ROLEVIA_WRITER_SOCKET', None)
+
+from database import Database, CompiledQuiz
+
+try:
+    # Embed building needs discord.py and a config module; without them the
+    # embed case only measures the description string the embed is built from
+    from cogs.rolevia import build_question_embed
+except ImportError:
+    build_question_embed = None
+
+GUILDS = 100
+QUIZZES = 50
+MESSAGES = 10000
+QUESTIONS = 20
+
+
+def make_questions(count: int = QUESTIONS):
+    return [
+        {
+            "question": f"Question {i}: which rule applies here?",
+            "options": [f"Option {j}" for j in range(1, 5)],
+            "correct_answers": [1 + i % 4],
+            "imglink": "" if i % 3 else f"https://example.com/{i}.png"
+        }
+        for i in range(count)
+    ]
+
+
+def seed(database: Database, rows: int):
+    # Logs go straight into quiz_logs; the aggregate tables are not needed by
+    # any of the read paths measured here
+    questions = json.dumps(make_questions())
+    start = time.time() - rows
+    with database.pool.writer() as conn, conn:
+        conn.executemany('''
+            INSERT INTO quiz_data (id, guild_id, questions, role_id, passing_percentage)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ((quiz_id, quiz_id % GUILDS, questions, quiz_id, 70) for quiz_id in range(1, QUIZZES + 1)))
+        conn.executemany('''
+            INSERT INTO quiz_messages (message_id, channel_id, guild_id, quiz_id)
+            VALUES (?, ?, ?, ?)
+        ''', ((message_id, message_id % 500, message_id % GUILDS, 1 + message_id % QUIZZES) for message_id in range(1, MESSAGES + 1)))
+        conn.executemany('''
+            INSERT INTO quiz_logs (guild_id, user_id, quiz_id, score, total_questions, passed, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            (i % GUILDS, i % 50000, 1 + i % QUIZZES, i % 21, 20, i % 21 >= 14,
+             time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i)))
+            for i in range(rows)
+        ))
+
+
+def measure(func, iterations: int, setup=None):
+    timings = []
+    for i in range(iterations):
+        if setup:
+            setup(i)
+        started = time.perf_counter_ns()
+        func(i)
+        timings.append(time.perf_counter_ns() - started)
+    timings.sort()
+    total = sum(timings) / 1e9
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total, 1) if total else None,
+        'p50_us': round(timings[len(timings) // 2] / 1000, 2),
+        'p99_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1000, 2),
+    }
+
+
+def database_cases(rows: int, iterations: int):
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database(os.path.join(directory, 'bench.db'))
+        seed_started = time.perf_counter()
+        seed(database, rows)
+        seed_seconds = time.perf_counter() - seed_started
+        # What a restart does: quiz messages are served from the bulk-loaded index
+        database.load_message_index()
+        rng = random.Random(rows)
+        results = {}
+
+        quiz_ids = [rng.randint(1, QUIZZES) for _ in range(iterations)]
+        for quiz_id in set(quiz_ids):
+            database.get_compiled_quiz(quiz_id)
+        results['get_compiled_quiz (cached)'] = measure(lambda i: database.get_compiled_quiz(quiz_ids[i]), iterations)
+        results['get_compiled_quiz (cold)'] = measure(
+            lambda i: database.get_compiled_quiz(quiz_ids[i]), iterations,
+            setup=lambda i: database.quiz_cache.invalidate(quiz_ids[i])
+        )
+
+        message_ids = [rng.randint(1, MESSAGES) for _ in range(iterations)]
+        results['get_quiz_from_message (cached)'] = measure(lambda i: database.get_quiz_from_message(message_ids[i]), iterations)
+        results['get_quiz_from_message (cold)'] = measure(
+            lambda i: database.get_quiz_from_message(message_ids[i]), iterations,
+            setup=lambda i: database.message_cache.invalidate(message_ids[i])
+        )
+
+        results['log_quiz_attempt (enqueue)'] = measure(
+            lambda i: database.log_quiz_attempt(i % GUILDS, i, 1 + i % QUIZZES, 15, 20, True), iterations
+        )
+        database.attempt_log.flush()
+
+        batch = [
+            (i % GUILDS, i, 1 + i % QUIZZES, 15, 20, True, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), None, None)
+            for i in range(100)
+        ]
+
+        def write_batch(i):
+            with database.pool.writer() as conn, conn:
+                database.write_attempts(conn, batch)
+
+        results['write_attempts (batch of 100)'] = measure(write_batch, max(1, iterations // 20))
+
+        guild_ids = [rng.randrange(GUILDS) for _ in range(iterations)]
+        results['get_quiz_logs (limit 50)'] = measure(lambda i: database.get_quiz_logs(guild_ids[i], 50), iterations)
+
+        database.close()
+        return {'seed_seconds': round(seed_seconds, 2), 'cases': results}
+
+
+def pure_cases(iterations: int):
+    quiz = CompiledQuiz(1, 1, make_questions(), 2, 70, '2024-01-01 00:00:00')
+    rng = random.Random(0)
+    answers = [bytes(rng.randint(1, 4) for _ in range(QUESTIONS)) for _ in range(iterations)]
+    results = {}
+
+    def click(i):
+        # The per-click work QuestionButton does before moving on
+        question = quiz.questions[i % QUESTIONS]
+        (question.correct_mask >> answers[i][0]) & 1
+
+    results['score one click'] = measure(click, iterations)
+    results['grade full attempt'] = measure(lambda i: quiz.grade(answers[i]), iterations)
+    results['is_passing'] = measure(lambda i: quiz.is_passing(i % (QUESTIONS + 1)), iterations)
+    results['question description'] = measure(lambda i: quiz.questions[i % QUESTIONS].description, iterations)
+    if build_question_embed is not None:
+        results['build_question_embed'] = measure(
+            lambda i: build_question_embed(quiz.questions[i % QUESTIONS], i % QUESTIONS, QUESTIONS), iterations
+        )
+    return results
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def flatten(results):
+        cases = {f"pure / {name}": stats for name, stats in results['pure'].items()}
+        for rows, run in results['database'].items():
+            cases.update({f"{rows} rows / {name}": stats for name, stats in run['cases'].items()})
+        return cases
+
+    before, after = flatten(baseline), flatten(current)
+    print(f"\nCompared with {baseline_path} (p50, negative is faster):")
+    for name, stats in after.items():
+        if name in before and before[name]['p50_us']:
+            change = (stats['p50_us'] - before[name]['p50_us']) / before[name]['p50_us'] * 100
+            print(f"  {name:<55} {before[name]['p50_us']:>10.2f}us -> {stats['p50_us']:>10.2f}us  {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ops/sec and p50/p99 latency of the database and scoring hot paths, no Discord connection needed.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000], help="quiz_logs sizes to seed")
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output', default='hot_paths.json', help="where to write the JSON results")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'iterations': args.iterations,
+        'pure': pure_cases(args.iterations),
+        'database': {},
+    }
+
+    for name, stats in results['pure'].items():
+        print(f"{name:<40} {stats['ops_per_sec']:>12,.0f} ops/s  p50 {stats['p50_us']:>8.2f}us  p99 {stats['p99_us']:>8.2f}us")
+
+    for rows in args.rows:
+        run = database_cases(rows, args.iterations)
+        results['database'][str(rows)] = run
+        print(f"\n{rows:,} quiz_logs rows (seeded in {run['seed_seconds']}s)")
+        for name, stats in run['cases'].items():
+            print(f"{name:<40} {stats['ops_per_sec']:>12,.0f} ops/s  p50 {stats['p50_us']:>8.2f}us  p99 {stats['p99_us']:>8.2f}us")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
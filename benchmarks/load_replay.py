@@ -0,0 +1,493 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+from collections import Counter, defaultdict, deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# database.py opens rolevia.db in the working directory on import, so the
+# harness moves into a scratch directory before importing any bot module
+STARTDIR = os.getcwd()
+WORKDIR = tempfile.mkdtemp(prefix='rolevia-replay-')
+os.chdir(WORKDIR)
+
+try:
+    import config
+except ImportError:
+    config = types.ModuleType('config')
+    config.token = 'replay-token'
+    config.cogs = ['cogs.rolevia']
+    sys.modules['config'] = config
+if 'cogs.rolevia' not in config.cogs:
+    config.cogs = list(config.cogs) + ['cogs.rolevia']
+
+import discord
+import discord.webhook.async_
+from aiohttp import web
+
+from bot import Bot
+from database import async_db
+
+APPLICATION_ID = 100000000000000001
+GUILD_ID = 200000000000000001
+CHANNEL_ID = 300000000000000001
+LOG_CHANNEL_ID = 300000000000000002
+ROLE_ID = 400000000000000001
+QUIZ_MESSAGE_ID = 500000000000000001
+USER_BASE = 600000000000000000
+
+snowflakes = itertools.count(700000000000000000)
+
+
+def timestamp() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+
+
+def user_payload(user_id: int, bot: bool = False) -> dict:
+    return {
+        'id': str(user_id),
+        'username': f'user{user_id % 100000}',
+        'global_name': None,
+        'discriminator': '0',
+        'avatar': None,
+        'bot': bot,
+    }
+
+
+BOT_USER = user_payload(APPLICATION_ID, bot=True)
+
+
+def message_payload(message_id: int, channel_id: int, data: dict) -> dict:
+    return {
+        'id': str(message_id),
+        'channel_id': str(channel_id),
+        'author': BOT_USER,
+        'content': data.get('content') or '',
+        'timestamp': timestamp(),
+        'edited_timestamp': None,
+        'tts': False,
+        'mention_everyone': False,
+        'mentions': [],
+        'mention_roles': [],
+        'attachments': [],
+        'embeds': data.get('embeds') or [],
+        'components': data.get('components') or [],
+        'pinned': False,
+        'type': 0,
+        'flags': data.get('flags', 0),
+    }
+
+
+def guild_payload() -> dict:
+    channel = {'type': 0, 'position': 0, 'permission_overwrites': [], 'nsfw': False, 'parent_id': None}
+    return {
+        'id': str(GUILD_ID),
+        'name': 'Replay Guild',
+        'owner_id': str(USER_BASE),
+        'features': [],
+        'emojis': [],
+        'stickers': [],
+        'members': [],
+        'member_count': 1,
+        'unavailable': False,
+        'roles': [
+            {'id': str(GUILD_ID), 'name': '@everyone', 'color': 0, 'hoist': False, 'position': 0,
+             'permissions': '0', 'managed': False, 'mentionable': False},
+            {'id': str(ROLE_ID), 'name': 'Passed', 'color': 0, 'hoist': False, 'position': 1,
+             'permissions': '0', 'managed': False, 'mentionable': False},
+        ],
+        'channels': [
+            dict(channel, id=str(CHANNEL_ID), name='quizzes'),
+            dict(channel, id=str(LOG_CHANNEL_ID), name='quiz-logs', position=1),
+        ],
+    }
+
+
+def json_response(data, status: int = 200, headers=None) -> web.Response:
+    # discord.py only parses bodies whose Content-Type is exactly application/json,
+    # so aiohttp's default "; charset=utf-8" suffix cannot be used
+    return web.Response(body=json.dumps(data).encode('utf-8'), status=status, headers=dict(headers or {}, **{'Content-Type': 'application/json'}))
+
+
+class FakeDiscord:
+    # Local stand-in for the parts of the Discord REST API the bot uses.
+    # Every request is counted by route template, and each route bucket
+    # allows `rate_limit` requests per `window` seconds before answering 429.
+    def __init__(self, rate_limit: int = 5, window: float = 1.0, latency: float = 0.0):
+        self.rate_limit = rate_limit
+        self.window = window
+        self.latency = latency
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.buckets = defaultdict(deque)
+        # Message payloads sent in response to each interaction token, in order
+        self.responses = defaultdict(asyncio.Queue)
+        self.original_messages = {}
+
+        self.app = web.Application(client_max_size=8 * 1024 * 1024)
+        self.app.router.add_route('*', '/api/v10/{path:.*}', self.handle)
+
+    async def read_payload(self, request: web.Request) -> dict:
+        if request.content_type == 'application/json':
+            return await request.json()
+        if request.content_type.startswith('multipart/'):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == 'payload_json':
+                    return json.loads(await part.text())
+        return {}
+
+    def route(self, method: str, parts: list) -> tuple:
+        # Collapse ids and interaction tokens into a template; the first id is the bucket's major parameter
+        template, major = [], None
+        for i, part in enumerate(parts):
+            if part.isdigit():
+                template.append('{id}')
+                major = major or part
+            elif i == 2 and parts[0] in ('interactions', 'webhooks'):
+                template.append('{token}')
+            else:
+                template.append(part)
+        return f"{method} /{'/'.join(template)}", major
+
+    def limited(self, route: str, major: str) -> float:
+        # Interaction callbacks and followups are tied to a token, not a shared bucket
+        if route.startswith(('POST /interactions', 'POST /webhooks', 'GET /webhooks', 'PATCH /webhooks', 'DELETE /webhooks')):
+            return 0.0
+        now = time.monotonic()
+        bucket = self.buckets[(route, major)]
+        while bucket and now - bucket[0] >= self.window:
+            bucket.popleft()
+        if len(bucket) >= self.rate_limit:
+            return self.window - (now - bucket[0])
+        bucket.append(now)
+        return 0.0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        parts = [part for part in request.match_info['path'].split('/') if part]
+        route, major = self.route(request.method, parts)
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        retry_after = self.limited(route, major)
+        if retry_after:
+            self.rate_limited[route] += 1
+            return json_response(
+                {'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': False},
+                status=429,
+                headers={
+                    'X-RateLimit-Limit': str(self.rate_limit),
+                    'X-RateLimit-Remaining': '0',
+                    'X-RateLimit-Reset-After': f'{retry_after:.3f}',
+                    'X-RateLimit-Bucket': route,
+                    'X-RateLimit-Scope': 'user',
+                    'Retry-After': f'{retry_after:.3f}',
+                }
+            )
+
+        if route == 'GET /users/@me':
+            return json_response(BOT_USER)
+        if route == 'GET /oauth2/applications/@me':
+            return json_response({
+                'id': str(APPLICATION_ID), 'name': 'Rolevia', 'icon': None, 'description': '',
+                'rpc_origins': None, 'bot_public': True, 'bot_require_code_grant': False,
+                'owner': user_payload(USER_BASE), 'team': None, 'verify_key': '0' * 64, 'flags': 0,
+            })
+        if parts[0] == 'interactions' and parts[-1] == 'callback':
+            return await self.interaction_callback(request, parts[2])
+        if parts[0] == 'webhooks' and len(parts) >= 3:
+            return await self.webhook(request, parts[2], parts[4] if len(parts) > 4 else None)
+        if route == 'POST /channels/{id}/messages':
+            data = await self.read_payload(request)
+            return json_response(message_payload(next(snowflakes), int(parts[1]), data))
+        if route == 'PUT /applications/{id}/commands':
+            # Global command sync in setup_hook; echo the commands back with ids
+            commands = await self.read_payload(request)
+            return json_response([
+                dict(command, id=str(next(snowflakes)), application_id=str(APPLICATION_ID), version=str(next(snowflakes)))
+                for command in commands
+            ])
+        if route == 'PUT /guilds/{id}/members/{id}/roles/{id}':
+            return web.Response(status=204)
+        return json_response({'message': 'Unknown route', 'code': 0}, status=404)
+
+    async def interaction_callback(self, request: web.Request, token: str) -> web.Response:
+        body = await self.read_payload(request)
+        data = body.get('data') or {}
+        message_id = self.original_messages.setdefault(token, next(snowflakes))
+        message = message_payload(message_id, CHANNEL_ID, data)
+        # Deferred responses (types 5 and 6) carry no message
+        if body.get('type') in (4, 7):
+            self.responses[token].put_nowait(message)
+        if request.query.get('with_response') in ('true', 'True', '1'):
+            return json_response({
+                'interaction': {'id': str(next(snowflakes)), 'type': 3, 'response_message_id': str(message_id),
+                                'response_message_loading': False, 'response_message_ephemeral': bool(data.get('flags', 0) & 64)},
+                'resource': {'type': body.get('type'), 'message': message},
+            })
+        return web.Response(status=204)
+
+    async def webhook(self, request: web.Request, token: str, target) -> web.Response:
+        if request.method == 'DELETE':
+            return web.Response(status=204)
+        if target == '@original':
+            message_id = self.original_messages.setdefault(token, next(snowflakes))
+        elif target:
+            message_id = int(target)
+        else:
+            message_id = next(snowflakes)
+        data = await self.read_payload(request) if request.method in ('POST', 'PATCH') else {}
+        message = message_payload(message_id, CHANNEL_ID, data)
+        if request.method in ('POST', 'PATCH'):
+            self.responses[token].put_nowait(message)
+        return json_response(message)
+
+
+class QuizUser:
+    # Clicks through one quiz the way a member would: the start button on the
+    # quiz message, then one of the buttons on each question it is shown
+    def __init__(self, bot: Bot, fake: FakeDiscord, user_id: int, questions: list, accuracy: float, think: float, timeout: float):
+        self.bot = bot
+        self.fake = fake
+        self.user_id = user_id
+        self.questions = questions
+        self.accuracy = accuracy
+        self.think = think
+        self.timeout = timeout
+        self.rng = random.Random(user_id)
+        self.click_latencies = []
+
+    def interaction(self, token: str, custom_id: str, message: dict) -> dict:
+        return {
+            'id': str(next(snowflakes)),
+            'application_id': str(APPLICATION_ID),
+            'type': 3,
+            'token': token,
+            'version': 1,
+            'guild_id': str(GUILD_ID),
+            'channel_id': str(CHANNEL_ID),
+            'channel': {'id': str(CHANNEL_ID), 'type': 0, 'guild_id': str(GUILD_ID), 'name': 'quizzes'},
+            'member': {
+                'user': user_payload(self.user_id),
+                'roles': [],
+                'joined_at': timestamp(),
+                'deaf': False,
+                'mute': False,
+                'flags': 0,
+                'permissions': '0',
+            },
+            'message': message,
+            'data': {'custom_id': custom_id, 'component_type': 2},
+            'locale': 'en-US',
+            'guild_locale': 'en-US',
+            'app_permissions': '0',
+            'entitlements': [],
+            # Required from discord.py 2.5 onwards
+            'attachment_size_limit': 8 * 1024 * 1024,
+            'context': 0,
+            'authorizing_integration_owners': {'0': str(GUILD_ID)},
+        }
+
+    async def click(self, custom_id: str, message: dict) -> dict:
+        token = f'token-{self.user_id}-{next(snowflakes)}'
+        started = time.perf_counter()
+        self.bot._connection.parse_interaction_create(self.interaction(token, custom_id, message))
+        responses = self.fake.responses[token]
+        try:
+            while True:
+                response = await asyncio.wait_for(responses.get(), self.timeout)
+                # Skip in-place edits that only clear the previous question
+                if response['components'] or any(embed.get('title') == 'Quiz Results' for embed in response['embeds']):
+                    break
+        finally:
+            self.fake.responses.pop(token, None)
+        self.click_latencies.append(time.perf_counter() - started)
+        return response
+
+    def choose(self, response: dict, index: int) -> str:
+        buttons = [component for row in response['components'] for component in row['components']]
+        correct = self.questions[index]['correct_answers']
+        if self.rng.random() < self.accuracy:
+            return buttons[correct[0] - 1]['custom_id']
+        return self.rng.choice(buttons)['custom_id']
+
+    async def take_quiz(self) -> bool:
+        start_message = message_payload(QUIZ_MESSAGE_ID, CHANNEL_ID, {
+            'components': [{'type': 1, 'components': [{'type': 2, 'style': 1, 'label': 'Start Quiz', 'custom_id': 'quiz_start_button'}]}]
+        })
+        response = await self.click('quiz_start_button', start_message)
+        for index in range(len(self.questions)):
+            if not response['components']:
+                return False
+            if self.think:
+                await asyncio.sleep(self.rng.uniform(0, self.think * 2))
+            response = await self.click(self.choose(response, index), dict(response, flags=64))
+        return any(embed.get('title') == 'Quiz Results' for embed in response['embeds'])
+
+
+async def monitor_lag(samples: list, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def replay(args) -> dict:
+    fake = FakeDiscord(args.rate_limit, args.window, args.latency / 1000)
+    runner = web.AppRunner(fake.app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    # Both the client's HTTP routes and interaction webhooks go to the stand-in
+    base = f'http://127.0.0.1:{port}/api/v10'
+    discord.http.Route.BASE = base
+    discord.webhook.async_.Route.BASE = base
+
+    # The cog reads this when load_extension imports it during login
+    config.stateless_quizzes = args.stateless
+    bot = Bot(intents=discord.Intents.default())
+    await bot.login(config.token)
+    bot._connection._add_guild_from_data(guild_payload())
+
+    questions = [
+        {
+            'question': f'Replay question {i + 1}',
+            'options': [f'Option {j}' for j in range(1, args.options + 1)],
+            'correct_answers': [1 + i % args.options],
+            'imglink': ''
+        }
+        for i in range(args.questions)
+    ]
+    quiz_id = await async_db.save_quiz(GUILD_ID, questions, ROLE_ID, 70)
+    await async_db.save_quiz_message(QUIZ_MESSAGE_ID, CHANNEL_ID, GUILD_ID, quiz_id)
+    await async_db.set_log_channel(GUILD_ID, LOG_CHANNEL_ID)
+
+    lag = []
+    monitor = asyncio.create_task(monitor_lag(lag))
+    users = [
+        QuizUser(bot, fake, USER_BASE + i, questions, args.accuracy, args.think / 1000, args.timeout)
+        for i in range(args.users)
+    ]
+
+    async def run_user(user: QuizUser):
+        completed = failed = 0
+        for _ in range(args.quizzes):
+            try:
+                if await user.take_quiz():
+                    completed += 1
+                else:
+                    failed += 1
+            except asyncio.TimeoutError:
+                failed += 1
+        return completed, failed
+
+    fake.calls.clear()
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(run_user(user) for user in users))
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+
+    # Role grants and log embeds are sent in the background and closing the
+    # bot cancels them, so wait until they are all sent before counting calls
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        logs = bot.log_dispatcher.stats()
+        if bot.role_grants.stats()['queued'] == 0 and logs['sent_embeds'] + logs['dropped'] >= logs['submitted']:
+            break
+        await asyncio.sleep(0.05)
+    drained = time.perf_counter() - started
+    await bot.close()
+    await runner.cleanup()
+
+    completed = sum(outcome[0] for outcome in outcomes)
+    failed = sum(outcome[1] for outcome in outcomes)
+    clicks = [latency for user in users for latency in user.click_latencies]
+    total_calls = sum(fake.calls.values())
+    return {
+        'users': args.users,
+        'quizzes_per_user': args.quizzes,
+        'questions': args.questions,
+        'stateless': args.stateless,
+        'completed': completed,
+        'failed': failed,
+        'elapsed_seconds': round(elapsed, 3),
+        'drained_seconds': round(drained, 3),
+        'quizzes_per_second': round(completed / elapsed, 2) if elapsed else None,
+        'api_calls': total_calls,
+        'api_calls_per_quiz': round(total_calls / completed, 2) if completed else None,
+        'api_calls_by_route': dict(fake.calls.most_common()),
+        'role_grants': bot.role_grants.stats()['granted'],
+        'log_messages': bot.log_dispatcher.stats()['sent_messages'],
+        'rate_limited': sum(fake.rate_limited.values()),
+        'rate_limited_by_route': dict(fake.rate_limited.most_common()),
+        'click_latency_ms': {
+            'p50': round(percentile(clicks, 0.5) * 1000, 2),
+            'p99': round(percentile(clicks, 0.99) * 1000, 2),
+        },
+        'loop_lag_ms': {
+            'p50': round(percentile(lag, 0.5) * 1000, 2),
+            'p99': round(percentile(lag, 0.99) * 1000, 2),
+            'max': round(max(lag, default=0.0) * 1000, 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent quiz takers through the real bot and cog against a local fake Discord API.")
+    parser.add_argument('--users', type=int, default=100, help="concurrent quiz takers")
+    parser.add_argument('--quizzes', type=int, default=1, help="quizzes each user takes, one after another")
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--accuracy', type=float, default=0.8, help="chance each answer is correct")
+    parser.add_argument('--think', type=float, default=0.0, help="mean pause between clicks in ms")
+    parser.add_argument('--latency', type=float, default=0.0, help="added latency per API call in ms")
+    parser.add_argument('--rate-limit', type=int, default=5, help="requests per bucket per window before 429")
+    parser.add_argument('--window', type=float, default=1.0, help="rate limit window in seconds")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for the bot to answer a click")
+    parser.add_argument('--stateless', action='store_true', help="use signed custom_id quiz state instead of QuizView")
+    parser.add_argument('--output', help="also write the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(replay(args))
+    finally:
+        os.chdir(STARTDIR)
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print(f"{report['completed']} quizzes completed, {report['failed']} failed, in {report['elapsed_seconds']}s "
+          f"({report['quizzes_per_second']} quizzes/s)")
+    print(f"API calls: {report['api_calls']} total, {report['api_calls_per_quiz']} per quiz, {report['rate_limited']} answered 429 "
+          f"({report['role_grants']} role grants, {report['log_messages']} log messages, all sent {report['drained_seconds']}s after the first click)")
+    for route, count in report['api_calls_by_route'].items():
+        limited = report['rate_limited_by_route'].get(route, 0)
+        print(f"  {count:>8}  {route}" + (f"  ({limited} x 429)" if limited else ""))
+    print(f"Click latency: p50 {report['click_latency_ms']['p50']}ms, p99 {report['click_latency_ms']['p99']}ms")
+    print(f"Event loop lag: p50 {report['loop_lag_ms']['p50']}ms, p99 {report['loop_lag_ms']['p99']}ms, max {report['loop_lag_ms']['max']}ms")
+
+    if args.output:
+        with open(os.path.join(STARTDIR, args.output), 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+# (description, sql, params, index that must appear in the plan)
+QUERIES = [
+    (
+        'quiz logs by guild, newest first',
+        'SELECT * FROM quiz_logs WHERE guild_id = ? ORDER BY timestamp DESC LIMIT ?',
+        (1, 50),
+        'idx_quiz_logs_guild_time',
+    ),
+    (
+        'quiz logs by guild and user',
+        'SELECT * FROM quiz_logs WHERE guild_id = ? AND user_id = ? ORDER BY timestamp DESC',
+        (1, 2),
+        'idx_quiz_logs_guild_user',
+    ),
+    (
+        'quiz logs by quiz',
+        'SELECT * FROM quiz_logs WHERE quiz_id = ? ORDER BY timestamp DESC',
+        (1,),
+        'idx_quiz_logs_quiz_time',
+    ),
+    (
+        'history page by guild, keyset',
+        'SELECT * FROM quiz_logs WHERE guild_id = ? AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?',
+        (1, '2024-01-01 00:00:00', 10, 11),
+        'idx_quiz_logs_guild_time',
+    ),
+    (
+        'history page by passed/failed, keyset',
+        'SELECT * FROM quiz_logs WHERE guild_id = ? AND passed = ? AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?',
+        (1, 1, '2024-01-01 00:00:00', 10, 11),
+        'idx_quiz_logs_guild_passed',
+    ),
+    (
+        'messages for a quiz',
+        'SELECT message_id FROM quiz_messages WHERE quiz_id = ?',
+        (1,),
+        'idx_quiz_messages_quiz',
+    ),
+    (
+        'messages in a guild',
+        'SELECT message_id FROM quiz_messages WHERE guild_id = ?',
+        (1,),
+        'idx_quiz_messages_guild',
+    ),
+    (
+        'quizzes in a guild',
+        'SELECT id FROM quiz_data WHERE guild_id = ?',
+        (1,),
+        'idx_quiz_data_guild',
+    ),
+]
+
+
+def check(database: Database) -> bool:
+    ok = True
+    for description, sql, params, index in QUERIES:
+        plan = database.explain_query_plan(sql, params)
+        uses_index = any(index in detail for detail in plan)
+        sorts = any('TEMP B-TREE' in detail for detail in plan)
+        status = 'ok' if uses_index and not sorts else 'FAIL'
+        ok = ok and status == 'ok'
+        print(f'[{status}] {description}: {" | ".join(plan)}')
+    return ok
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    if path:
+        database = Database(path)
+        ok = check(database)
+        database.close()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = Database(os.path.join(tmp, 'plans.db'))
+            ok = check(database)
+            database.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import CompiledQuiz
+
+
+def make_questions(quiz_number: int, count: int = 20):
+    return [
+        {
+            "question": f"Quiz {quiz_number} question {i}: which rule applies here?",
+            "options": [f" Option {j} for question {i} " for j in range(1, 5)],
+            "correct_answers": [1 + i % 4],
+            "imglink": "" if i % 3 else f"https://example.com/{quiz_number}/{i}.png"
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build, payloads):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    quizzes = [build(i, payload) for i, payload in enumerate(payloads)]
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return quizzes, size, elapsed
+
+
+def build_dict(quiz_id, payload):
+    return {
+        'id': quiz_id,
+        'guild_id': 1,
+        'questions': json.loads(payload),
+        'role_id': 2,
+        'passing_percentage': 70,
+        'created_at': '2024-01-01 00:00:00'
+    }
+
+
+def build_compiled(quiz_id, payload):
+    return CompiledQuiz(quiz_id, 1, json.loads(payload), 2, 70, '2024-01-01 00:00:00')
+
+
+def score_dicts(quizzes):
+    start = time.perf_counter()
+    for quiz in quizzes:
+        correct = 0
+        for question in quiz['questions']:
+            if 2 in question['correct_answers']:
+                correct += 1
+        correct >= len(quiz['questions']) * quiz['passing_percentage'] / 100
+    return time.perf_counter() - start
+
+
+def score_compiled(quizzes):
+    start = time.perf_counter()
+    for quiz in quizzes:
+        correct = 0
+        for question in quiz.questions:
+            if (question.correct_mask >> 2) & 1:
+                correct += 1
+        quiz.is_passing(correct)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory footprint of cached quizzes, raw dicts vs CompiledQuiz.")
+    parser.add_argument('--quizzes', type=int, default=10000)
+    parser.add_argument('--questions', type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = [json.dumps(make_questions(i, args.questions)) for i in range(args.quizzes)]
+
+    dicts, dict_size, dict_build = measure(build_dict, payloads)
+    dict_score = score_dicts(dicts)
+    del dicts
+    compiled, compiled_size, compiled_build = measure(build_compiled, payloads)
+    compiled_score = score_compiled(compiled)
+
+    print(f"{args.quizzes} quizzes x {args.questions} questions")
+    print(f"    dicts: {dict_size / 1024 / 1024:7.1f} MiB, build {dict_build:.2f}s, score all {dict_score * 1000:.1f}ms")
+    print(f" compiled: {compiled_size / 1024 / 1024:7.1f} MiB, build {compiled_build:.2f}s, score all {compiled_score * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,158 @@
 from discord.ext import commands
 import discord
+import hashlib
+import json
+from typing import Optional
 import config
-from database import db
+from database import async_db
+from webhooks import WebhookManager
+from customids import ANSWER_PREFIX, LOGS_PREFIX
+from grants import RoleGrantQueue
+from logdispatch import LogDispatcher
+from metrics import metrics, instrument_http, MetricsServer
 
-class Bot(commands.Bot):
+def interaction_route(interaction: discord.Interaction) -> Optional[str]:
+    # Metrics label for the component interactions Bot.route_interaction handles.
+    # None for everything else, which CommandTree and the view store dispatch.
+    if interaction.type != discord.InteractionType.component:
+        return None
+    custom_id = interaction.data.get('custom_id', '')
+    if custom_id == 'quiz_start_button':
+        return 'quiz_start'
+    if custom_id.startswith(ANSWER_PREFIX):
+        return 'stateless_answer'
+    if custom_id.startswith(LOGS_PREFIX):
+        return 'logs_page'
+    return None
+
+def command_tree_hash(tree: discord.app_commands.CommandTree) -> str:
+    # Hash of the global command payload tree.sync() would upload
+    payload = []
+    for command in tree.get_commands():
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py < 2.4 builds the payload without the tree
+            payload.append(command.to_dict())
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class Bot(commands.AutoShardedBot):
     def __init__(self, intents: discord.Intents, **kwargs):
         super().__init__(command_prefix=commands.when_mentioned_or('$'), intents=intents, **kwargs)
+        self.webhooks = WebhookManager()
+        self.role_grants = RoleGrantQueue(self)
+        self.log_dispatcher = LogDispatcher(self)
+        self.metrics_server = None
 
     async def setup_hook(self):
+        instrument_http(self)
+        metrics.gauge('rolevia_role_grants_queued', lambda: self.role_grants.stats()['queued'])
+        metrics.gauge('rolevia_log_embeds_buffered', lambda: self.log_dispatcher.stats()['buffered'])
+        metrics.gauge('rolevia_attempt_log_queue_depth', lambda: async_db.attempt_log_stats()['queue_depth'])
+        metrics_port = getattr(config, 'metrics_port', None)
+        if metrics_port:
+            self.metrics_server = MetricsServer(metrics_port, getattr(config, 'metrics_host', '127.0.0.1'))
+            await self.metrics_server.start()
+        profile_sql_ms = getattr(config, 'profile_sql_ms', None)
+        if profile_sql_ms is not None:
+            await async_db.enable_profiling(profile_sql_ms)
+        
+        await self.webhooks.start()
+        await self.role_grants.replay()
         for cog in config.cogs:
             try:
                 await self.load_extension(cog)
             except Exception as exc:
                 print(f'Could not load extension {cog} due to {exc.__class__.__name__}: {exc}')
+                metrics.inc('rolevia_extension_errors_total', extension=cog)
+        
+        if 'cogs.rolevia' in self.extensions:
+            # Import here to avoid circular imports
+            from cogs.rolevia import PersistentQuizStartView
+            # Registered once; the view store keeps it across gateway reconnects
+            self.add_view(PersistentQuizStartView())
+        
+        # In a cluster only the process running shard 0 syncs
+        if self.shard_ids is None or 0 in self.shard_ids:
+            await self.sync_commands()
+
+    async def sync_commands(self) -> bool:
+        # Global syncs are rate limited, so the tree is only uploaded when its
+        # hash differs from the one stored after the last successful sync
+        key = f'command_tree_hash:{self.application_id}'
+        digest = command_tree_hash(self.tree)
+        if await async_db.get_state(key) == digest:
+            return False
+        try:
+            await self.tree.sync()
+        except discord.HTTPException as exc:
+            print(f'Could not sync application commands: {exc}')
+            return False
+        await async_db.set_state(key, digest)
+        print(f'Synced {len(self.tree.get_commands())} application commands')
+        return True
 
     async def on_ready(self):
         print(f'Logged on as {self.user} (ID: {self.user.id})')
-        await self.tree.sync()
-        
+
+    async def close(self):
+        await self.role_grants.close()
+        await self.log_dispatcher.close()
+        await super().close()
+        await self.webhooks.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        async_db.close()
+    
     async def on_interaction(self, interaction: discord.Interaction):
+        route = interaction_route(interaction)
+        if route is None:
+            return
+        with metrics.timer('rolevia_interaction_seconds', route=route):
+            await self.route_interaction(interaction)
+        
+    async def route_interaction(self, interaction: discord.Interaction):
         # Handle persistent view interactions for quiz buttons
         if interaction.type == discord.InteractionType.component:
             custom_id = interaction.data.get('custom_id', '')
             
             if custom_id == 'quiz_start_button':
                 # Import here to avoid circular imports
-                from cogs.rolevia import QuizView
+                from cogs.rolevia import start_quiz_session
                 
                 # Get quiz ID from message mapping
-                quiz_id = db.get_quiz_from_message(interaction.message.id)
+                quiz_id = await async_db.get_quiz_from_message(interaction.message.id)
                 
                 if quiz_id:
-                    quiz_data = db.get_quiz(quiz_id)
-                    if quiz_data:
-                        quiz_view = QuizView(quiz_data, interaction.user)
-                        await quiz_view.start_quiz(interaction)
+                    quiz = await async_db.get_compiled_quiz(quiz_id)
+                    if quiz:
+                        await start_quiz_session(interaction, quiz)
                     else:
                         await interaction.response.send_message("Quiz not found!", ephemeral=True)
                 else:
                     await interaction.response.send_message("Quiz not found for this message!", ephemeral=True)
                 return
-        
-        # Let other interactions be handled normally
-        await self.process_application_commands(interaction)
+            
+            if custom_id.startswith(ANSWER_PREFIX):
+                from cogs.rolevia import handle_stateless_answer
+                await handle_stateless_answer(interaction)
+                return
+            
+            if custom_id.startswith(LOGS_PREFIX):
+                from cogs.rolevia import handle_logs_page
+                await handle_logs_page(interaction)
+                return
+
+
+def create_bot(**kwargs) -> Bot:
+    # kwargs are passed through, e.g. shard_ids/shard_count from cluster.py
+    intents = discord.Intents.default()
+    intents.message_content = True
+    return Bot(intents=intents, **kwargs)
 
 
-intents = discord.Intents.default()
-intents.message_content = True
-bot = Bot(intents=intents)
+if __name__ == '__main__':
+    bot = create_bot()
 
-bot.run(config.token)
+    bot.run(config.token)
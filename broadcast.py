@@ -0,0 +1,29 @@
+import asyncio
+import discord
+from typing import Awaitable, Callable, Iterable, List, Tuple
+
+async def send_concurrently(
+    channels: Iterable[discord.abc.Messageable],
+    send: Callable[[discord.abc.Messageable], Awaitable[discord.Message]],
+    limit: int = 10
+) -> Tuple[List[Tuple[discord.abc.Messageable, discord.Message]], List[Tuple[discord.abc.Messageable, str]]]:
+    # Caps how many requests are in flight at once. Every target is a
+    # different channel, so each request lands in its own rate-limit bucket;
+    # discord.py still waits out 429s and the global limit itself.
+    semaphore = asyncio.Semaphore(limit)
+    sent = []
+    failed = []
+    
+    async def worker(channel):
+        async with semaphore:
+            try:
+                message = await send(channel)
+            except discord.HTTPException as e:
+                failed.append((channel, f"{e.status} {e.text or e.__class__.__name__}"))
+            except Exception as e:
+                failed.append((channel, str(e) or e.__class__.__name__))
+            else:
+                sent.append((channel, message))
+    
+    await asyncio.gather(*(worker(channel) for channel in channels))
+    return sent, failed
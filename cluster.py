@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+from typing import List, Optional
+
+# Bot processes are started with spawn so each one imports database.py fresh
+# and opens its own read-only connections instead of inheriting the launcher's.
+context = multiprocessing.get_context('spawn')
+
+def shard_ranges(shard_count: int, processes: int) -> List[List[int]]:
+    # Contiguous, evenly sized shard ranges, one per process
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+def recommended_shards(token: str) -> int:
+    import aiohttp
+
+    async def fetch():
+        async with aiohttp.ClientSession() as session:
+            async with session.get('https://discord.com/api/v10/gateway/bot', headers={'Authorization': f'Bot {token}'}) as response:
+                response.raise_for_status()
+                return (await response.json())['shards']
+    return asyncio.run(fetch())
+
+def run_writer(db_path: str, socket_path: str):
+    os.environ['ROLEVIA_DB'] = db_path
+    os.environ.pop('ROLEVIA_WRITER_SOCKET', None)
+    import dbwriter
+    from database import db
+    asyncio.run(dbwriter.serve(db, socket_path))
+
+def run_shards(db_path: str, socket_path: str, shard_ids: List[int], shard_count: int):
+    os.environ['ROLEVIA_DB'] = db_path
+    os.environ['ROLEVIA_WRITER_SOCKET'] = socket_path
+    # bot.run() shuts down cleanly on KeyboardInterrupt, which flushes the attempt log
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    import config
+    from bot import create_bot
+    create_bot(shard_ids=shard_ids, shard_count=shard_count).run(config.token)
+
+def wait_for_writer(socket_path: str, timeout: float = 30.0) -> bool:
+    from dbwriter import WriterClient
+    client = WriterClient(socket_path, timeout=1.0)
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            try:
+                return client.call('ping')
+            except sqlite3.Error:
+                time.sleep(0.2)
+        return False
+    finally:
+        client.close()
+
+class Cluster:
+    # Starts the database writer, then one bot process per shard range, and
+    # restarts any process that exits until the cluster is stopped.
+    def __init__(self, db_path: str, socket_path: str, shard_count: int, processes: int, restart_delay: float = 5.0):
+        self.db_path = os.path.abspath(db_path)
+        self.socket_path = os.path.abspath(socket_path)
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, processes)
+        self.restart_delay = restart_delay
+        self.writer: Optional[multiprocessing.Process] = None
+        self.bots: List[Optional[multiprocessing.Process]] = [None] * len(self.ranges)
+        self.restarts = 0
+        self.stopping = False
+
+    def start_writer(self):
+        self.writer = context.Process(target=run_writer, args=(self.db_path, self.socket_path), name='rolevia-writer')
+        self.writer.start()
+        if not wait_for_writer(self.socket_path):
+            raise RuntimeError(f'Database writer did not come up on {self.socket_path}')
+
+    def start_bot(self, index: int):
+        shard_ids = self.ranges[index]
+        process = context.Process(
+            target=run_shards,
+            args=(self.db_path, self.socket_path, shard_ids, self.shard_count),
+            name=f'rolevia-shards-{shard_ids[0]}-{shard_ids[-1]}'
+        )
+        process.start()
+        self.bots[index] = process
+        print(f'Started {process.name} (pid {process.pid})')
+
+    def start(self):
+        self.start_writer()
+        for index in range(len(self.ranges)):
+            self.start_bot(index)
+
+    def supervise(self):
+        while not self.stopping:
+            time.sleep(1.0)
+            if self.stopping:
+                break
+            if not self.writer.is_alive():
+                print(f'Database writer exited with {self.writer.exitcode}, restarting')
+                self.restarts += 1
+                self.start_writer()
+            for index, process in enumerate(self.bots):
+                if process is not None and not process.is_alive() and not self.stopping:
+                    print(f'{process.name} exited with {process.exitcode}, restarting in {self.restart_delay}s')
+                    self.restarts += 1
+                    time.sleep(self.restart_delay)
+                    self.start_bot(index)
+
+    def stop(self, timeout: float = 30.0):
+        # Bots first, so their last attempt-log flush still reaches the writer
+        self.stopping = True
+        for process in self.bots:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.bots:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.kill()
+        if self.writer is not None and self.writer.is_alive():
+            self.writer.terminate()
+            self.writer.join(timeout)
+            if self.writer.is_alive():
+                self.writer.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run rolevia as several sharded processes sharing one database writer.")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="bot processes to start")
+    parser.add_argument('--shards', type=int, help="total shard count (default: config.shard_count, else Discord's recommendation)")
+    parser.add_argument('--db', default='rolevia.db')
+    parser.add_argument('--socket', default='rolevia-writer.sock')
+    args = parser.parse_args()
+
+    import config
+    shard_count = args.shards or getattr(config, 'shard_count', None) or recommended_shards(config.token)
+    cluster = Cluster(args.db, args.socket, shard_count, args.processes)
+    print(f'Running {shard_count} shards in {len(cluster.ranges)} processes: {[[r[0], r[-1]] for r in cluster.ranges]}')
+
+    def request_stop(signum, frame):
+        cluster.stopping = True
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    cluster.start()
+    try:
+        cluster.supervise()
+    finally:
+        cluster.stop()
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,176 @@
-from discord.ext import commands
+from discord.ext import commands, tasks
 import discord
 from discord.ui import View, Button, Select, Modal, TextInput
 import json
-import aiohttp
-from typing import Optional, Union
-from database import db
+import asyncio
+import io
+import calendar
+import sqlite3
+import time
+from typing import Optional, Union, Literal
+import config
+from database import async_db, CompiledQuiz, CompiledQuestion
+from broadcast import send_concurrently
+from sessions import SessionRegistry
+from customids import encode_answer, decode_answer, derive_secret, encode_logs_cursor, decode_logs_cursor
+from export import export_quiz_logs, export_filename
+from quizfile import parse_quiz_file, dump_quizzes, QuizFileError
+from metrics import metrics
+
+# Stateless mode keeps quiz progress in signed component custom_ids instead of
+# in-process QuizView objects, so any process can answer any click.
+STATELESS_QUIZZES = getattr(config, 'stateless_quizzes', False)
+ANSWER_SECRET = derive_secret(config)
+MAX_IMPORT_SIZE = 1024 * 1024
+# Days quiz attempts are kept for servers that have not set their own; None keeps them forever
+RETENTION_DAYS = getattr(config, 'retention_days', None)
+
+# In-flight quiz attempts keyed by (guild_id, user_id, quiz_id), setup
+# wizards keyed by (guild_id, user_id) and graded stateless quizzes keyed by
+# (user_id, quiz_id, message_id). All are expired by Rolevia.sweep_sessions.
+quiz_sessions = SessionRegistry(ttl=900, max_sessions=10000)
+setup_sessions = SessionRegistry(ttl=1800, max_sessions=500)
+graded_quizzes = SessionRegistry(ttl=300)
+
+async def start_quiz_session(interaction: discord.Interaction, quiz: CompiledQuiz):
+    metrics.inc('rolevia_quizzes_started_total')
+    if STATELESS_QUIZZES:
+        await interaction.response.send_message(
+            embed=build_question_embed(quiz.questions[0], 0, quiz.total_questions),
+            view=build_stateless_question_view(quiz, 0, 0, interaction.user.id),
+            ephemeral=True
+        )
+        return
+    
+    key = (interaction.guild.id, interaction.user.id, quiz.id)
+    quiz_view = quiz_sessions.start(key, lambda: QuizView(quiz, interaction.user, key))
+    if quiz_view is None:
+        await interaction.response.send_message("Too many quizzes are in progress right now, please try again in a few minutes.", ephemeral=True)
+        return
+    await quiz_view.start_quiz(interaction)
+
+def build_question_embed(question: CompiledQuestion, index: int, total: int) -> discord.Embed:
+    embed = discord.Embed(
+        description=question.description,
+        color=discord.Color.purple()
+    )
+    
+    embed.set_author(name=f"Question {index + 1}/{total}")
+    if question.imglink:
+        embed.set_image(url=question.imglink)
+    return embed
+
+def build_stateless_question_view(quiz: CompiledQuiz, index: int, score: int, user_id: int, answers: bytes = b"") -> View:
+    view = View(timeout=None)
+    for option in range(1, len(quiz.questions[index].options) + 1):
+        view.add_item(Button(
+            style=discord.ButtonStyle.secondary,
+            label=str(option),
+            custom_id=encode_answer(ANSWER_SECRET, user_id, quiz.id, index, score, option, answers)
+        ))
+    # A finished view is not kept in discord.py's view store; clicks are routed
+    # through Bot.on_interaction to handle_stateless_answer instead
+    view.stop()
+    return view
+
+async def handle_stateless_answer(interaction: discord.Interaction):
+    state = decode_answer(ANSWER_SECRET, interaction.user.id, interaction.data.get('custom_id', ''))
+    if state is None:
+        await interaction.response.send_message("This quiz button is not valid for you.", ephemeral=True)
+        return
+    
+    quiz = await async_db.get_compiled_quiz(state.quiz_id)
+    if not quiz or state.question_index >= quiz.total_questions:
+        await interaction.response.send_message("Quiz not found!", ephemeral=True)
+        return
+    
+    score = state.score
+    if (quiz.questions[state.question_index].correct_mask >> state.option) & 1:
+        score += 1
+    answers = state.answers + bytes((state.option,))
+    
+    next_index = state.question_index + 1
+    if next_index < quiz.total_questions:
+        # Edit the ephemeral message in place, one API call per answer
+        await interaction.response.edit_message(
+            embed=build_question_embed(quiz.questions[next_index], next_index, quiz.total_questions),
+            view=build_stateless_question_view(quiz, next_index, score, interaction.user.id, answers)
+        )
+    else:
+        # Two quick clicks on the last question both arrive before the buttons
+        # are removed; only the first one is graded and logged
+        if not graded_quizzes.claim((interaction.user.id, quiz.id, interaction.message.id)):
+            await interaction.response.defer()
+            return
+        await interaction.response.edit_message(content="Quiz complete!", embed=None, view=None)
+        await finish_quiz(interaction, quiz, score, answers)
 
 class Rolevia(commands.Cog):
     def __init__(self, bot):
         self.bot: commands.Bot = bot
-        
+        self.sweep_sessions.start()
+        self.maintenance.start()
+        metrics.gauge('rolevia_active_quizzes', lambda: quiz_sessions.stats()['active'])
+        metrics.gauge('rolevia_active_setups', lambda: setup_sessions.stats()['active'])
+
+    async def cog_unload(self):
+        self.sweep_sessions.cancel()
+        self.maintenance.cancel()
+        quiz_sessions.close()
+        setup_sessions.close()
+        graded_quizzes.close()
+
+    @tasks.loop(seconds=30)
+    async def sweep_sessions(self):
+        quiz_sessions.sweep()
+        setup_sessions.sweep()
+        graded_quizzes.sweep()
+
+    @tasks.loop(hours=24)
+    async def maintenance(self):
+        # Every process prunes the servers on its own shards; the process with
+        # shard 0 also removes orphaned mappings and shrinks the file
+        shard_ids = getattr(self.bot, 'shard_ids', None)
+        vacuum = shard_ids is None or 0 in shard_ids
+        try:
+            report = await async_db.run_maintenance([guild.id for guild in self.bot.guilds], RETENTION_DAYS, vacuum)
+        except sqlite3.Error as exc:
+            print(f'Database maintenance failed: {exc}')
+            metrics.inc('rolevia_suppressed_errors_total', where='maintenance')
+            return
+        metrics.inc('rolevia_maintenance_attempts_pruned_total', report['attempts_pruned'])
+        metrics.inc('rolevia_maintenance_messages_removed_total', report['messages_removed'])
+        metrics.inc('rolevia_maintenance_bytes_reclaimed_total', report['bytes_reclaimed'])
+        if report['attempts_pruned'] or report['messages_removed'] or report['bytes_reclaimed']:
+            print(
+                f"Maintenance: pruned {report['attempts_pruned']} attempts in {report['guilds']} servers, "
+                f"removed {report['messages_removed']} orphaned quiz messages, reclaimed {report['bytes_reclaimed']} bytes"
+            )
+        if vacuum and not report['incremental_vacuum']:
+            print('Maintenance: the database file is not in incremental auto_vacuum mode, so freed pages are not '
+                  'returned to the filesystem. Run /rolevia compact once, at a quiet time, to convert it.')
+
+    @maintenance.before_loop
+    async def before_maintenance(self):
+        await self.bot.wait_until_ready()
+
     @commands.Cog.listener()
-    async def on_ready(self):
-        # Register persistent views to ensure buttons work after bot restart
-        self.bot.add_view(PersistentQuizStartView())
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if async_db.is_quiz_message(payload.message_id):
+            await async_db.delete_quiz_messages([payload.message_id])
 
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        message_ids = [message_id for message_id in payload.message_ids if async_db.is_quiz_message(message_id)]
+        if message_ids:
+            await async_db.delete_quiz_messages(message_ids)
+
+    def session_stats(self):
+        return {
+            'quizzes': quiz_sessions.stats(),
+            'setups': setup_sessions.stats()
+        }
+        
     @commands.command()
     async def sync(self, ctx):
         self.bot.tree.copy_global_to(guild=ctx.guild)
@@ -46,11 +202,66 @@ class Rolevia(commands.Cog):
                 value="Create a webhook in the specified channel for quiz embeds", 
                 inline=False
             )
+            embed.add_field(
+                name="/rolevia retention [days]", 
+                value="Show or set how many days quiz attempts are kept (0 keeps them forever)", 
+                inline=False
+            )
             embed.add_field(
                 name="/rolevia send", 
                 value="Send a quiz embed to a channel", 
                 inline=False
             )
+            embed.add_field(
+                name="/rolevia broadcast", 
+                value="Send a quiz embed to several channels or categories at once", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia stats <quiz_id>", 
+                value="Show attempts, pass rate and score distribution for a quiz", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia questions <quiz_id>", 
+                value="Show how often each question is answered correctly", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia logs [user] [quiz_id] [result]", 
+                value="Browse quiz attempts page by page", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia export [format] [compress]", 
+                value="Download this server's full quiz attempt history as CSV or JSONL", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia import <file>", 
+                value="Create quizzes from an uploaded JSON or CSV file", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia dump", 
+                value="Download every quiz in this server as a JSON file that can be re-imported", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia health", 
+                value="Show database, queue and latency health for the bot", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia queries [order]", 
+                value="Bot owner only: show the most expensive SQL statements when profiling is on", 
+                inline=False
+            )
+            embed.add_field(
+                name="/rolevia compact", 
+                value="Bot owner only: one-time database rewrite so maintenance can shrink the file. Blocks quiz saves and logging while it runs", 
+                inline=False
+            )
             await ctx.send(embed=embed)
     
     @rolevia.command(
@@ -76,7 +287,7 @@ class Rolevia(commands.Cog):
     )
     @commands.has_permissions(manage_roles=True)
     async def logger(self, ctx: discord.ext.commands.Context, channel: discord.TextChannel):
-        db.set_log_channel(ctx.guild.id, channel.id)
+        await async_db.set_log_channel(ctx.guild.id, channel.id)
         
         embed = discord.Embed(
             title="Logger Channel Set",
@@ -89,6 +300,33 @@ class Rolevia(commands.Cog):
         else:
             await ctx.send(embed=embed)
 
+    @rolevia.command(
+        name="retention",
+        description="Show or set how many days quiz attempts are kept."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def retention(self, ctx: discord.ext.commands.Context, days: Optional[int] = None):
+        if days is not None:
+            if days < 0:
+                await ctx.send("Retention must be 0 (keep forever) or a number of days.", ephemeral=True)
+                return
+            await async_db.set_retention_days(ctx.guild.id, days)
+        
+        current = await async_db.get_retention_days(ctx.guild.id)
+        if current is None:
+            current = RETENTION_DAYS
+        if current:
+            description = f"Quiz attempts older than {current} days are removed. Quiz stats and question difficulty keep counting them."
+        else:
+            description = "Quiz attempts are kept forever."
+        
+        embed = discord.Embed(
+            title="Attempt Retention Set" if days is not None else "Attempt Retention",
+            description=description,
+            color=discord.Color.green() if days is not None else discord.Color.purple()
+        )
+        await ctx.send(embed=embed)
+
     @rolevia.command(
         name="webhook",
         description="Set up a webhook for sending quiz embeds."
@@ -102,7 +340,8 @@ class Rolevia(commands.Cog):
                 reason="Created by Rolevia bot for quiz embeds"
             )
             
-            db.set_webhook_url(ctx.guild.id, webhook.url)
+            await async_db.set_webhook_url(ctx.guild.id, webhook.url)
+            self.bot.webhooks.invalidate(ctx.guild.id)
             
             embed = discord.Embed(
                 title="Webhook Created",
@@ -149,6 +388,316 @@ class Rolevia(commands.Cog):
         else:
             await ctx.send("This command can only be used as a slash command.")
 
+    @rolevia.command(
+        name="broadcast",
+        description="Send a quiz embed to several channels at once."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def broadcast(self, ctx: discord.ext.commands.Context):
+        modal = BroadcastQuizModal()
+        
+        if ctx.interaction:
+            await ctx.interaction.response.send_modal(modal)
+        else:
+            await ctx.send("This command can only be used as a slash command.")
+
+    @rolevia.command(
+        name="stats",
+        description="Show attempt statistics for a quiz."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def stats(self, ctx: discord.ext.commands.Context, quiz_id: int):
+        quiz = await async_db.get_compiled_quiz(quiz_id)
+        if not quiz or quiz.guild_id != ctx.guild.id:
+            await ctx.send("Quiz not found!", ephemeral=True)
+            return
+        
+        # Answered from the per-day aggregates, independent of how large quiz_logs is
+        stats = await async_db.get_quiz_stats(quiz_id)
+        attempts = stats['attempts']
+        
+        embed = discord.Embed(
+            title=f"Quiz {quiz_id} Statistics",
+            color=discord.Color.purple()
+        )
+        embed.add_field(name="Attempts", value=str(attempts), inline=True)
+        embed.add_field(name="Passes", value=str(stats['passes']), inline=True)
+        if attempts:
+            average = stats['score_sum'] / attempts
+            embed.add_field(name="Pass Rate", value=f"{stats['passes'] / attempts * 100:.1f}%", inline=True)
+            embed.add_field(
+                name="Average Score",
+                value=f"{average:.2f}/{quiz.total_questions} ({average / quiz.total_questions * 100:.1f}%)",
+                inline=True
+            )
+            embed.add_field(name="Active", value=f"{stats['first_day']} → {stats['last_day']}", inline=True)
+            
+            peak = max(stats['histogram'].values())
+            lines = []
+            for score in range(quiz.total_questions + 1):
+                count = stats['histogram'].get(score, 0)
+                bar = "█" * round(count / peak * 12) if count else ""
+                lines.append(f"{score:>2} | {bar} {count}")
+            embed.add_field(name="Score Distribution", value="```" + "\n".join(lines)[:1000] + "```", inline=False)
+        
+        await ctx.send(embed=embed)
+
+    @rolevia.command(
+        name="questions",
+        description="Show per-question difficulty for a quiz."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def questions(self, ctx: discord.ext.commands.Context, quiz_id: int):
+        quiz = await async_db.get_compiled_quiz(quiz_id)
+        if not quiz or quiz.guild_id != ctx.guild.id:
+            await ctx.send("Quiz not found!", ephemeral=True)
+            return
+        
+        report = await async_db.get_question_difficulty(quiz)
+        embed = discord.Embed(
+            title=f"Quiz {quiz_id} Question Difficulty",
+            description=f"Based on {report['attempts']} attempts with recorded answers.",
+            color=discord.Color.purple()
+        )
+        
+        if report['attempts']:
+            # Hardest questions first
+            ranked = sorted(enumerate(report['questions']), key=lambda item: item[1]['correct_rate'])
+            for index, result in ranked[:25]:
+                question = quiz.questions[index]
+                picks = " ".join(
+                    f"{'✅' if question.is_correct(option) else ''}{option}: {count}"
+                    for option, count in enumerate(result['picks'], 1)
+                )
+                embed.add_field(
+                    name=f"Q{index + 1} - {result['correct_rate'] * 100:.1f}% correct",
+                    value=f"{question.text[:200]}\n{picks}"[:1024],
+                    inline=False
+                )
+        
+        await ctx.send(embed=embed)
+
+    @rolevia.command(
+        name="logs",
+        description="Browse quiz attempts in this server."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def logs(
+        self,
+        ctx: discord.ext.commands.Context,
+        user: Optional[discord.User] = None,
+        quiz_id: Optional[int] = None,
+        result: Optional[Literal['passed', 'failed']] = None
+    ):
+        embed, view = await build_logs_page(
+            ctx.guild,
+            user.id if user else None,
+            quiz_id,
+            None if result is None else result == 'passed'
+        )
+        await ctx.send(embed=embed, view=view, ephemeral=True)
+
+    @rolevia.command(
+        name="export",
+        description="Export this server's quiz attempt logs."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def export(self, ctx: discord.ext.commands.Context, format: Literal['csv', 'jsonl'] = 'csv', compress: bool = True):
+        await ctx.defer(ephemeral=True)
+        
+        # The export streams page by page into a spooled temp file off the event loop
+        exported, rows = await asyncio.to_thread(export_quiz_logs, async_db.database, ctx.guild.id, format, compress)
+        with exported:
+            size = exported.seek(0, 2)
+            exported.seek(0)
+            if size > ctx.guild.filesize_limit:
+                await ctx.send(
+                    f"The export is {size / 1024 / 1024:.1f} MB, over this server's upload limit. Try `compress` or the `export.py` command line tool.",
+                    ephemeral=True
+                )
+                return
+            
+            await ctx.send(
+                f"Exported {rows} quiz attempts.",
+                file=discord.File(exported, filename=export_filename(ctx.guild.id, format, compress)),
+                ephemeral=True
+            )
+
+    @rolevia.command(
+        name="import",
+        description="Create quizzes from an uploaded JSON or CSV file."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def import_quizzes(self, ctx: discord.ext.commands.Context, file: discord.Attachment):
+        await ctx.defer(ephemeral=True)
+        
+        if file.size > MAX_IMPORT_SIZE:
+            await ctx.send(f"The file is too large. Quiz files are limited to {MAX_IMPORT_SIZE // 1024} KB.", ephemeral=True)
+            return
+        
+        data = await file.read()
+        try:
+            quizzes = parse_quiz_file(file.filename, data)
+        except QuizFileError as e:
+            errors = "\n".join(e.errors[:20])
+            if len(e.errors) > 20:
+                errors += f"\n...and {len(e.errors) - 20} more"
+            await ctx.send(f"Nothing was imported. Fix these problems and try again:\n```{errors[:1800]}```", ephemeral=True)
+            return
+        
+        missing_roles = sorted({quiz['role_id'] for quiz in quizzes if not ctx.guild.get_role(quiz['role_id'])})
+        if missing_roles:
+            await ctx.send(
+                f"Nothing was imported. These roles do not exist in this server: {', '.join(map(str, missing_roles))}",
+                ephemeral=True
+            )
+            return
+        
+        quiz_ids = await async_db.save_quizzes(ctx.guild.id, quizzes)
+        await ctx.send(
+            f"Imported {len(quiz_ids)} quizzes. Quiz IDs: {', '.join(map(str, quiz_ids))}",
+            ephemeral=True
+        )
+    
+    @rolevia.command(
+        name="dump",
+        description="Download every quiz in this server as JSON."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def dump(self, ctx: discord.ext.commands.Context):
+        await ctx.defer(ephemeral=True)
+        
+        quizzes = await async_db.get_guild_quizzes(ctx.guild.id)
+        if not quizzes:
+            await ctx.send("This server has no quizzes yet.", ephemeral=True)
+            return
+        
+        data = dump_quizzes(quizzes)
+        await ctx.send(
+            f"Exported {len(quizzes)} quizzes.",
+            file=discord.File(io.BytesIO(data), filename=f"rolevia-quizzes-{ctx.guild.id}.json"),
+            ephemeral=True
+        )
+
+    @rolevia.command(
+        name="health",
+        description="Show database, queue and latency health."
+    )
+    @commands.has_permissions(manage_roles=True)
+    async def health(self, ctx: discord.ext.commands.Context):
+        db_health = await async_db.health_check()
+        quizzes = quiz_sessions.stats()
+        attempt_log = async_db.attempt_log_stats()
+        grants = self.bot.role_grants.stats()
+        dispatch = self.bot.log_dispatcher.stats()
+        caches = async_db.cache_stats()
+        
+        def latency(summary):
+            if not summary['count']:
+                return "no samples"
+            return f"p50 ≤ {summary['p50'] * 1000:g}ms, p99 ≤ {summary['p99'] * 1000:g}ms ({summary['count']} calls)"
+        
+        def hit_rate(stats):
+            lookups = stats['hits'] + stats['misses']
+            return f"{stats['hits'] / lookups * 100:.1f}%" if lookups else "n/a"
+        
+        healthy = db_health['writer'] and db_health['readers_ok'] > 0
+        embed = discord.Embed(
+            title="Rolevia Health",
+            color=discord.Color.green() if healthy else discord.Color.red()
+        )
+        embed.add_field(name="Gateway", value=f"{self.bot.latency * 1000:.0f}ms", inline=True)
+        embed.add_field(
+            name="Database",
+            value=f"writer {'ok' if db_health['writer'] else 'FAILED'}, {db_health['readers_ok']} readers ok, {db_health.get('journal_mode', '?')}",
+            inline=True
+        )
+        embed.add_field(name="Active Quizzes", value=f"{quizzes['active']}/{quizzes['max_sessions']}", inline=True)
+        embed.add_field(
+            name="Queues",
+            value=(
+                f"attempt log: {attempt_log['queue_depth']} waiting, {attempt_log['failures']} failed batches, {attempt_log['dropped']} dropped\n"
+                f"role grants: {grants['queued']} queued, {grants['failed']} failed\n"
+                f"log embeds: {dispatch['buffered']} buffered, {dispatch['dropped']} dropped"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Cache Hit Rate",
+            value=f"quizzes {hit_rate(caches['quizzes'])}, messages {hit_rate(caches['messages'])}",
+            inline=False
+        )
+        embed.add_field(
+            name="Latency",
+            value=(
+                f"interactions: {latency(metrics.overall('rolevia_interaction_seconds'))}\n"
+                f"database: {latency(metrics.overall('rolevia_db_seconds'))}\n"
+                f"Discord API: {latency(metrics.overall('rolevia_discord_request_seconds'))}"
+            ),
+            inline=False
+        )
+        errors = {
+            'interactions': metrics.total('rolevia_interaction_errors_total'),
+            'database': metrics.total('rolevia_db_errors_total'),
+            'Discord API': metrics.total('rolevia_discord_request_errors_total'),
+            'ignored': metrics.total('rolevia_suppressed_errors_total')
+        }
+        embed.add_field(name="Errors", value=", ".join(f"{name}: {count:g}" for name, count in errors.items()), inline=False)
+        await ctx.send(embed=embed, ephemeral=True)
+
+    @rolevia.command(
+        name="queries",
+        description="Show the most expensive SQL statements (profiling mode)."
+    )
+    @commands.is_owner()
+    async def queries(self, ctx: discord.ext.commands.Context, order: Literal['total', 'max', 'calls', 'steps'] = 'total'):
+        report = async_db.profile_report(limit=10, order=order)
+        if report is None:
+            await ctx.send("SQL profiling is off. Set `profile_sql_ms` in config to turn it on.", ephemeral=True)
+            return
+        
+        embed = discord.Embed(
+            title="SQL Statements",
+            description=f"Top statements by {order}",
+            color=discord.Color.purple()
+        )
+        for stats in report['statements']:
+            embed.add_field(
+                name=f"{stats['method'] or '?'}: {stats['calls']} calls, {stats['total_ms']:.1f}ms total, {stats['max_ms']:.1f}ms max",
+                value=f"```sql\n{stats['sql'][:900]}```",
+                inline=False
+            )
+        # Only statement templates are shown; the bound values may belong to other servers
+        slow = report['slow'][-3:]
+        if slow:
+            embed.add_field(
+                name="Recent Slow Queries",
+                value="\n".join(
+                    f"{entry['ms']:.1f}ms {entry['method'] or '?'}: {'; '.join(entry['plan']) or 'no plan'}"
+                    for entry in reversed(slow)
+                )[:1000],
+                inline=False
+            )
+        await ctx.send(embed=embed, ephemeral=True)
+
+    @rolevia.command(
+        name="compact",
+        description="Rewrite the database once so maintenance can shrink it (blocks writes while running)."
+    )
+    @commands.is_owner()
+    async def compact(self, ctx: discord.ext.commands.Context):
+        await ctx.defer(ephemeral=True)
+        started = time.perf_counter()
+        try:
+            converted = await async_db.enable_incremental_vacuum()
+        except sqlite3.Error as exc:
+            await ctx.send(f"Could not convert the database: {exc}", ephemeral=True)
+            return
+        if converted:
+            await ctx.send(f"Database rewritten in {time.perf_counter() - started:.1f}s. Daily maintenance will now return freed space to the filesystem.", ephemeral=True)
+        else:
+            await ctx.send("The database already uses incremental vacuum, nothing to do.", ephemeral=True)
+
 class SendQuizModal(Modal):
     def __init__(self):
         super().__init__(title="Send Quiz Embed")
@@ -197,8 +746,8 @@ class SendQuizModal(Modal):
             quiz_id = int(self.quiz_id_input.value)
             channel_id = int(self.channel_input.value)
             
-            quiz_data = db.get_quiz(quiz_id)
-            if not quiz_data:
+            quiz = await async_db.get_compiled_quiz(quiz_id)
+            if not quiz:
                 await interaction.response.send_message("Quiz not found!", ephemeral=True)
                 return
             
@@ -207,42 +756,23 @@ class SendQuizModal(Modal):
                 await interaction.response.send_message("Channel not found!", ephemeral=True)
                 return
             
-            # Create embed
-            embed = None
-            if self.embed_json_input.value.strip():
-                # Use JSON embed
-                try:
-                    embed_data = json.loads(self.embed_json_input.value)
-                    embed = discord.Embed.from_dict(embed_data)
-                except json.JSONDecodeError:
-                    await interaction.response.send_message("Invalid JSON format!", ephemeral=True)
-                    return
-            else:
-                # Use simple title/description
-                role = interaction.guild.get_role(quiz_data['role_id'])
-                title = self.title_input.value if self.title_input.value else "Quiz Available!"
-                description = (
-                    self.description_input.value if self.description_input.value 
-                    else f"Take this quiz to earn the {role.mention} role!\nPassing score: {quiz_data['passing_percentage']}%"
-                )
-                
-                embed = discord.Embed(
-                    title=title,
-                    description=description,
-                    color=discord.Color.purple()
-                )
+            try:
+                embed = self.build_embed(interaction.guild, quiz)
+            except json.JSONDecodeError:
+                await interaction.response.send_message("Invalid JSON format!", ephemeral=True)
+                return
             
             # Send via webhook if configured, otherwise send normally
-            webhook_url = db.get_webhook_url(interaction.guild.id)
-            if webhook_url:
-                await self.send_via_webhook(webhook_url, embed, quiz_data, interaction.guild, channel)
+            webhook = await interaction.client.webhooks.get(interaction.guild.id)
+            if webhook:
+                await self.send_via_webhook(interaction.client.webhooks, webhook, embed, quiz, interaction.guild, channel)
             else:
                 message = await channel.send(
                     embed=embed,
-                    view=QuizStartView(quiz_data)
+                    view=QuizStartView(quiz)
                 )
                 # Save message-quiz mapping for persistent button handling
-                db.save_quiz_message(message.id, channel.id, interaction.guild.id, quiz_data['id'])
+                await async_db.save_quiz_message(message.id, channel.id, interaction.guild.id, quiz.id)
             
             await interaction.response.send_message(f"Quiz sent to {channel.mention}!", ephemeral=True)
             
@@ -251,49 +781,185 @@ class SendQuizModal(Modal):
         except Exception as e:
             await interaction.response.send_message(f"Error: {str(e)}", ephemeral=True)
 
-    async def send_via_webhook(self, webhook_url: str, embed: discord.Embed, quiz_data: dict, guild: discord.Guild, channel: discord.TextChannel):
-        # Create webhook from URL if it doesn't exist, or use the channel's webhook
+    def build_embed(self, guild: discord.Guild, quiz: CompiledQuiz) -> discord.Embed:
+        if self.embed_json_input.value.strip():
+            # Use JSON embed
+            embed_data = json.loads(self.embed_json_input.value)
+            return discord.Embed.from_dict(embed_data)
+        
+        # Use simple title/description
+        role = guild.get_role(quiz.role_id)
+        title = self.title_input.value if self.title_input.value else "Quiz Available!"
+        description = (
+            self.description_input.value if self.description_input.value 
+            else f"Take this quiz to earn the {role.mention} role!\nPassing score: {quiz.passing_percentage}%"
+        )
+        
+        return discord.Embed(
+            title=title,
+            description=description,
+            color=discord.Color.purple()
+        )
+
+    async def send_via_webhook(self, webhooks, webhook: discord.Webhook, embed: discord.Embed, quiz: CompiledQuiz, guild: discord.Guild, channel: discord.TextChannel):
+        # The webhook and its HTTP session are shared and owned by the bot's WebhookManager
         try:
-            webhook = discord.Webhook.from_url(webhook_url, session=aiohttp.ClientSession())
             message = await webhook.send(
                 embed=embed,
                 username=guild.name,
                 avatar_url=str(guild.icon.url) if guild.icon else None,
-                view=PersistentQuizStartView(quiz_data['id']),
+                view=PersistentQuizStartView(quiz.id),
                 wait=True
             )
-            await webhook.session.close()
             
             # Save message-quiz mapping for persistent button handling
-            db.save_quiz_message(message.id, channel.id, guild.id, quiz_data['id'])
+            await async_db.save_quiz_message(message.id, channel.id, guild.id, quiz.id)
             
         except Exception as e:
+            print(f'Webhook send failed in guild {guild.id}, falling back to the bot: {e.__class__.__name__}: {e}')
+            metrics.inc('rolevia_webhook_fallbacks_total', error=e.__class__.__name__)
+            if isinstance(e, discord.NotFound):
+                # Webhook was deleted on Discord's side, don't keep reusing it
+                webhooks.invalidate(guild.id)
             # Fallback to regular channel send if webhook fails
             message = await channel.send(
                 embed=embed,
-                view=PersistentQuizStartView(quiz_data['id'])
+                view=PersistentQuizStartView(quiz.id)
             )
             # Save message-quiz mapping for persistent button handling
-            db.save_quiz_message(message.id, channel.id, guild.id, quiz_data['id'])
+            await async_db.save_quiz_message(message.id, channel.id, guild.id, quiz.id)
             raise Exception(f"Webhook failed: {str(e)}")
 
+class BroadcastQuizModal(SendQuizModal):
+    def __init__(self):
+        super().__init__()
+        self.title = "Broadcast Quiz Embed"
+        self.channel_input.label = "Channel or Category IDs"
+        self.channel_input.placeholder = "IDs separated by spaces, commas or new lines"
+        self.channel_input.style = discord.TextStyle.paragraph
+        self.channel_input.max_length = 2000
+
+    def resolve_channels(self, guild: discord.Guild):
+        channels = {}
+        unknown = []
+        for raw_id in self.channel_input.value.replace(',', ' ').split():
+            target = guild.get_channel(int(raw_id))
+            if isinstance(target, discord.CategoryChannel):
+                for channel in target.text_channels:
+                    channels[channel.id] = channel
+            elif isinstance(target, discord.TextChannel):
+                channels[target.id] = target
+            else:
+                unknown.append(raw_id)
+        return list(channels.values()), unknown
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            quiz_id = int(self.quiz_id_input.value)
+            channels, unknown = self.resolve_channels(interaction.guild)
+        except ValueError:
+            await interaction.response.send_message("Invalid ID format!", ephemeral=True)
+            return
+        
+        quiz = await async_db.get_compiled_quiz(quiz_id)
+        if not quiz or quiz.guild_id != interaction.guild.id:
+            await interaction.response.send_message("Quiz not found!", ephemeral=True)
+            return
+        
+        if not channels:
+            await interaction.response.send_message("No text channels found!", ephemeral=True)
+            return
+        
+        try:
+            embed = self.build_embed(interaction.guild, quiz)
+        except json.JSONDecodeError:
+            await interaction.response.send_message("Invalid JSON format!", ephemeral=True)
+            return
+        
+        # Fanning out can take longer than the 3 second interaction window
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        
+        async def send(channel: discord.TextChannel):
+            return await channel.send(embed=embed, view=PersistentQuizStartView(quiz.id))
+        
+        sent, failed = await send_concurrently(channels, send)
+        
+        # All message mappings are written in a single transaction
+        try:
+            await async_db.save_quiz_messages([
+                (message.id, channel.id, interaction.guild.id, quiz.id)
+                for channel, message in sent
+            ])
+        except sqlite3.Error as exc:
+            print(f'Failed to save broadcast quiz messages: {exc}')
+            # Without a mapping the Start buttons cannot be resolved, so take the messages down again
+            messages = {channel.id: message for channel, message in sent}
+            _, stranded = await send_concurrently(
+                [channel for channel, _ in sent],
+                lambda channel: messages[channel.id].delete()
+            )
+            content = f"Sent to {len(sent)}/{len(channels)} channels, but saving the quiz messages failed: {exc}"
+            if stranded:
+                content += "\nThese messages could not be removed and will not respond: " + " ".join(channel.mention for channel, _ in stranded)
+            else:
+                content += "\nThe sent messages were removed, try again."
+            await interaction.followup.send(content[:2000], ephemeral=True)
+            return
+        
+        summary = discord.Embed(
+            title="Broadcast Summary",
+            description=f"Sent to {len(sent)}/{len(channels)} channels.",
+            color=discord.Color.green() if not failed else discord.Color.orange()
+        )
+        if sent:
+            summary.add_field(
+                name="Sent",
+                value=" ".join(channel.mention for channel, _ in sent)[:1024],
+                inline=False
+            )
+        if failed:
+            summary.add_field(
+                name="Failed",
+                value="\n".join(f"{channel.mention}: {error}" for channel, error in failed)[:1024],
+                inline=False
+            )
+        if unknown:
+            summary.add_field(
+                name="Not found",
+                value=", ".join(unknown)[:1024],
+                inline=False
+            )
+        
+        await interaction.followup.send(embed=summary, ephemeral=True)
+
 class CreateRoleviaView(View):
     def __init__(self):
         super().__init__()
 
     @discord.ui.button(label="Create a new Rolevia", style=discord.ButtonStyle.primary)
     async def create_rolevia(self, interaction: discord.Interaction, button: discord.ui.Button):
+        key = (interaction.guild.id, interaction.user.id)
+        wizard = setup_sessions.start(key, lambda: QuestionNumberSelect(key))
+        if wizard is None:
+            await interaction.response.send_message("Too many quiz setups are in progress, please try again later.", ephemeral=True)
+            return
+        
         button.disabled = True
         await interaction.message.edit(view=self)
         await interaction.response.send_message(
             "Select the number of questions:",
-            view=QuestionNumberSelect(),
+            view=wizard,
             ephemeral=True
         )
 
 class QuestionNumberSelect(View):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, key=None):
+        # No per-view timer, the wizard is expired through setup_sessions
+        super().__init__(timeout=None)
+        self.key = key
+        self.views = [self]
+        self.modal = None
+        self.closed = False
         self.questions = []
         self.current_question = 0
         self.messages_to_delete = []  
@@ -308,6 +974,14 @@ class QuestionNumberSelect(View):
         self.number_select.callback = self.number_selected
         self.add_item(self.number_select)
 
+    def close(self):
+        self.closed = True
+        for view in self.views:
+            view.stop()
+        if self.modal:
+            # Unblocks a pending modal.wait() for a modal the user dismissed
+            self.modal.stop()
+
     async def number_selected(self, interaction: discord.Interaction):
         self.total_questions = int(self.number_select.values[0])
         self.number_select.disabled = True
@@ -324,21 +998,29 @@ class QuestionNumberSelect(View):
 
 class SetQuestionView(View):
     def __init__(self, number_select: QuestionNumberSelect):
-        super().__init__()
+        super().__init__(timeout=None)
         self.number_select = number_select
+        number_select.views.append(self)
 
     @discord.ui.button(label="Set Question", style=discord.ButtonStyle.primary)
     async def set_question(self, interaction: discord.Interaction, button: discord.ui.Button):
         button.disabled = True
         try:
             await interaction.message.edit(view=self)
-        except:
-            pass
+        except discord.HTTPException:
+            metrics.inc('rolevia_suppressed_errors_total', where='setup_disable_button')
             
         modal = QuestionModal(title=f"Question {self.number_select.current_question + 1}")
         modal.number_select = self.number_select
+        self.number_select.modal = modal
         await interaction.response.send_modal(modal)
         await modal.wait()
+        self.number_select.modal = None
+        self.stop()
+        
+        if self.number_select.closed:
+            return
+        setup_sessions.touch(self.number_select.key)
         
         self.number_select.questions.append(modal.question_data)
         self.number_select.current_question += 1
@@ -351,11 +1033,12 @@ class SetQuestionView(View):
             )
             self.number_select.messages_to_delete.append(message)
         else:
+            setup_sessions.end(self.number_select.key, self.number_select)
             for msg in self.number_select.messages_to_delete:
                 try:
                     await msg.delete()
-                except:
-                    pass
+                except discord.HTTPException:
+                    metrics.inc('rolevia_suppressed_errors_total', where='setup_cleanup')
             
             await interaction.followup.send(
                 "Select the role to assign upon quiz completion:",
@@ -402,8 +1085,8 @@ class QuestionModal(Modal):
             if hasattr(self, 'number_select') and self.number_select:
                 msg = await interaction.original_response()
                 self.number_select.messages_to_delete.append(msg)
-        except:
-            pass
+        except discord.HTTPException:
+            metrics.inc('rolevia_suppressed_errors_total', where='question_saved_reply')
 
 class RoleSelectView(View):
     def __init__(self, questions, interaction: discord.Interaction):
@@ -459,7 +1142,7 @@ class PassingPercentageView(View):
         self.quiz_data["passing_percentage"] = passing_percentage
         
         # Save quiz to database
-        quiz_id = db.save_quiz(
+        quiz_id = await async_db.save_quiz(
             interaction.guild.id,
             self.quiz_data["questions"],
             self.quiz_data["role_id"],
@@ -472,15 +1155,14 @@ class PassingPercentageView(View):
         )
 
 class QuizStartView(View):
-    def __init__(self, quiz_data):
+    def __init__(self, quiz: CompiledQuiz):
         super().__init__()
-        self.quiz_data = quiz_data
+        self.quiz = quiz
         self.timeout = 98989898
 
     @discord.ui.button(label="Start Quiz", style=discord.ButtonStyle.success)
     async def start_quiz(self, interaction: discord.Interaction, button: Button):
-        quiz_view = QuizView(self.quiz_data, interaction.user)
-        await quiz_view.start_quiz(interaction)
+        await start_quiz_session(interaction, self.quiz)
 
 class PersistentQuizStartView(View):
     def __init__(self, quiz_id: int = None):
@@ -493,133 +1175,227 @@ class PersistentQuizStartView(View):
         pass
 
 class QuizView:
-    def __init__(self, quiz_data, user):
-        self.quiz_data = quiz_data
+    # One in-flight attempt, owned by quiz_sessions
+    __slots__ = ('quiz', 'user', 'key', 'current_question', 'correct_answers', 'total_questions', 'current_message', 'current_view', 'answers')
+
+    def __init__(self, quiz: CompiledQuiz, user, key=None):
+        self.quiz = quiz
         self.user = user
+        self.key = key
         self.current_question = 0
         self.correct_answers = 0
-        self.total_questions = len(quiz_data["questions"])
+        self.total_questions = quiz.total_questions
         self.current_message = None
+        self.current_view = None
+        # Chosen option per question, 0 while unanswered
+        self.answers = bytearray(quiz.total_questions)
 
     async def start_quiz(self, interaction: discord.Interaction):
-        question_data = self.quiz_data["questions"][self.current_question]
-        embed = self.create_question_embed(question_data)
-        view = QuestionView(question_data, self)
+        question = self.quiz.questions[self.current_question]
+        embed = self.create_question_embed(question)
+        view = QuestionView(question, self)
+        self.current_view = view
         message = await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         self.current_message = await interaction.original_response()
 
-    def create_question_embed(self, question_data):
-        options_text = "\n".join(f"{i}. {option.strip()}" for i, option in enumerate(question_data["options"], 1))
-        
-        embed = discord.Embed(
-            description=f"**{question_data['question']}**\n\n{options_text}",
-            color=discord.Color.purple()
-        )
-        
-        embed.set_author(name=f"Question {self.current_question + 1}/{self.total_questions}")
-        if question_data["imglink"]:
-            embed.set_image(url=question_data["imglink"])
-        return embed
+    def close(self):
+        # Views have no timeout of their own, so they must be stopped to leave the view store
+        if self.current_view:
+            self.current_view.stop()
+            self.current_view = None
+
+    def create_question_embed(self, question: CompiledQuestion):
+        return build_question_embed(question, self.current_question, self.total_questions)
 
 class QuestionView(View):
-    def __init__(self, question_data, quiz_view):
-        super().__init__()
-        self.question_data = question_data
+    def __init__(self, question: CompiledQuestion, quiz_view):
+        super().__init__(timeout=None)
+        self.question = question
         self.quiz_view = quiz_view
         
-        for i, option in enumerate(question_data["options"], 1):
-            self.add_item(QuestionButton(i, option.strip()))
+        for i, option in enumerate(question.options, 1):
+            self.add_item(QuestionButton(i, option))
 
 class QuestionButton(Button):
     def __init__(self, number, option):
         super().__init__(
             style=discord.ButtonStyle.secondary,
-            label=str(number),
-            custom_id=str(number)
+            label=str(number)
         )
+        self.number = number
 
+    @metrics.timed('rolevia_interaction_seconds', route='answer')
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         
         quiz_view = self.view.quiz_view
-        if int(self.custom_id) in self.view.question_data["correct_answers"]:
+        if (self.view.question.correct_mask >> self.number) & 1:
             quiz_view.correct_answers += 1
+        quiz_view.answers[quiz_view.current_question] = self.number
+        self.view.stop()
+        quiz_sessions.touch(quiz_view.key)
 
         quiz_view.current_question += 1
         
         if quiz_view.current_message:
             try:
                 await quiz_view.current_message.delete()
-            except:
-                pass
+            except discord.HTTPException:
+                # Usually already gone; the next question is sent regardless
+                metrics.inc('rolevia_suppressed_errors_total', where='delete_question')
 
-        question_data = quiz_view.quiz_data["questions"][quiz_view.current_question] if quiz_view.current_question < quiz_view.total_questions else None
+        question = quiz_view.quiz.questions[quiz_view.current_question] if quiz_view.current_question < quiz_view.total_questions else None
         
-        if question_data:
-            embed = quiz_view.create_question_embed(question_data)
-            view = QuestionView(question_data, quiz_view)
+        if question:
+            embed = quiz_view.create_question_embed(question)
+            view = QuestionView(question, quiz_view)
+            quiz_view.current_view = view
             message = await interaction.followup.send(embed=embed, view=view, ephemeral=True)
             quiz_view.current_message = message
         else:
             # Show results and log
-            await self.finish_quiz(interaction, quiz_view)
+            quiz_sessions.end(quiz_view.key, quiz_view)
+            await finish_quiz(interaction, quiz_view.quiz, quiz_view.correct_answers, bytes(quiz_view.answers))
 
-    async def finish_quiz(self, interaction: discord.Interaction, quiz_view):
-        passing_percentage = quiz_view.quiz_data.get("passing_percentage", 70)
-        required_correct = (quiz_view.total_questions * passing_percentage) / 100
-        passed = quiz_view.correct_answers >= required_correct
-        
-        # Log the attempt
-        db.log_quiz_attempt(
-            interaction.guild.id,
-            interaction.user.id,
-            quiz_view.quiz_data.get('id', 0),
-            quiz_view.correct_answers,
-            quiz_view.total_questions,
-            passed
-        )
-        
-        embed = discord.Embed(
-            title="Quiz Results",
-            description=f"Score: {quiz_view.correct_answers}/{quiz_view.total_questions} ({quiz_view.correct_answers / quiz_view.total_questions * 100:.2f}%)",
+LOGS_PAGE_SIZE = 10
+
+async def build_logs_page(
+    guild: discord.Guild,
+    user_id: Optional[int] = None,
+    quiz_id: Optional[int] = None,
+    passed: Optional[bool] = None,
+    before: Optional[tuple] = None,
+    after: Optional[tuple] = None
+):
+    rows, has_more = await async_db.get_quiz_logs_page(guild.id, user_id, quiz_id, passed, before, after, LOGS_PAGE_SIZE)
+    if after is not None and not rows:
+        # Nothing newer any more, fall back to the first page
+        return await build_logs_page(guild, user_id, quiz_id, passed)
+    
+    filters = []
+    if user_id is not None:
+        filters.append(f"user <@{user_id}>")
+    if quiz_id is not None:
+        filters.append(f"quiz {quiz_id}")
+    if passed is not None:
+        filters.append("passed" if passed else "failed")
+    
+    lines = []
+    for row in rows:
+        epoch = calendar.timegm(time.strptime(row['timestamp'], '%Y-%m-%d %H:%M:%S'))
+        lines.append(
+            f"{'✅' if row['passed'] else '❌'} <t:{epoch}:f> <@{row['user_id']}> "
+            f"quiz {row['quiz_id']} - {row['score']}/{row['total_questions']}"
         )
+    
+    embed = discord.Embed(
+        title="Quiz Attempts",
+        description="\n".join(lines) if lines else "No attempts found.",
+        color=discord.Color.purple()
+    )
+    if filters:
+        embed.set_footer(text="Filtered by " + ", ".join(filters))
+    
+    # Newer/older availability depends on which way this page was fetched
+    has_newer = (before is not None) or (after is not None and has_more)
+    has_older = has_more if after is None else True
+    
+    view = View(timeout=None)
+    if rows:
+        first, last = rows[0], rows[-1]
+        newer_id = encode_logs_cursor('a', first['timestamp'], first['id'], user_id, quiz_id, passed)
+        older_id = encode_logs_cursor('b', last['timestamp'], last['id'], user_id, quiz_id, passed)
+    else:
+        newer_id, older_id = "rv:l:none:a", "rv:l:none:b"
+    view.add_item(Button(label="◀ Newer", style=discord.ButtonStyle.secondary, custom_id=newer_id, disabled=not rows or not has_newer))
+    view.add_item(Button(label="Older ▶", style=discord.ButtonStyle.secondary, custom_id=older_id, disabled=not rows or not has_older))
+    # Page state lives in the custom_ids, clicks are routed through Bot.on_interaction
+    view.stop()
+    return embed, view
 
-        if passed:
-            role = interaction.guild.get_role(quiz_view.quiz_data["role_id"])
-            await interaction.user.add_roles(role)
-            embed.add_field(
-                name="Congratulations!", 
-                value=f"You passed and received the {role.mention} role!"
-            )
-            embed.color = discord.Color.green()
+async def handle_logs_page(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_roles:
+        await interaction.response.send_message("You need the Manage Roles permission to view quiz logs.", ephemeral=True)
+        return
+    
+    cursor = decode_logs_cursor(interaction.data.get('custom_id', ''))
+    if cursor is None:
+        await interaction.response.send_message("This page is no longer available.", ephemeral=True)
+        return
+    
+    key = (cursor.timestamp, cursor.row_id)
+    embed, view = await build_logs_page(
+        interaction.guild,
+        cursor.user_id,
+        cursor.quiz_id,
+        cursor.passed,
+        before=key if cursor.direction == 'b' else None,
+        after=key if cursor.direction == 'a' else None
+    )
+    await interaction.response.edit_message(embed=embed, view=view)
+
+async def finish_quiz(interaction: discord.Interaction, quiz: CompiledQuiz, score: int, answers: Optional[bytes] = None):
+    passed = quiz.is_passing(score)
+    metrics.inc('rolevia_quizzes_finished_total', passed='true' if passed else 'false')
+    
+    # Log the attempt
+    await async_db.log_quiz_attempt(
+        interaction.guild.id,
+        interaction.user.id,
+        quiz.id,
+        score,
+        quiz.total_questions,
+        passed,
+        answers,
+        quiz.grade(answers)[1] if answers else None
+    )
+    
+    embed = discord.Embed(
+        title="Quiz Results",
+        description=f"Score: {score}/{quiz.total_questions} ({score / quiz.total_questions * 100:.2f}%)",
+    )
+
+    if passed:
+        role = interaction.guild.get_role(quiz.role_id)
+        if role is None:
+            value = "You passed, but the reward role no longer exists."
+        elif role in interaction.user.roles:
+            value = f"You passed! You already have the {role.mention} role."
         else:
-            embed.add_field(
-                name="Sorry!", 
-                value="You did not pass the quiz. Try again!"
+            # Granted by the per-guild queue so a wave of passes can't lose grants to 429s
+            await interaction.client.role_grants.submit(interaction.guild.id, interaction.user.id, role.id, quiz.id)
+            value = f"You passed and will receive the {role.mention} role shortly!"
+        embed.add_field(
+            name="Congratulations!", 
+            value=value
+        )
+        embed.color = discord.Color.green()
+    else:
+        embed.add_field(
+            name="Sorry!", 
+            value="You did not pass the quiz. Try again!"
+        )
+        embed.color = discord.Color.red()
+    
+    await interaction.followup.send(embed=embed, ephemeral=True)
+    
+    # Send log to logging channel if configured
+    log_channel_id = await async_db.get_log_channel(interaction.guild.id)
+    if log_channel_id:
+        log_channel = interaction.guild.get_channel(log_channel_id)
+        if log_channel:
+            log_embed = discord.Embed(
+                title="Quiz Attempt Logged",
+                color=discord.Color.green() if passed else discord.Color.red()
             )
-            embed.color = discord.Color.red()
-        
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        
-        # Send log to logging channel if configured
-        log_channel_id = db.get_log_channel(interaction.guild.id)
-        if log_channel_id:
-            log_channel = interaction.guild.get_channel(log_channel_id)
-            if log_channel:
-                log_embed = discord.Embed(
-                    title="Quiz Attempt Logged",
-                    color=discord.Color.green() if passed else discord.Color.red()
-                )
-                log_embed.add_field(name="User", value=interaction.user.mention, inline=True)
-                log_embed.add_field(name="Score", value=f"{quiz_view.correct_answers}/{quiz_view.total_questions}", inline=True)
-                log_embed.add_field(name="Passed", value="✅ Yes" if passed else "❌ No", inline=True)
-                log_embed.add_field(name="Quiz ID", value=quiz_view.quiz_data.get('id', 'Unknown'), inline=True)
-                log_embed.timestamp = discord.utils.utcnow()
-                
-                try:
-                    await log_channel.send(embed=log_embed)
-                except:
-                    pass
+            log_embed.add_field(name="User", value=interaction.user.mention, inline=True)
+            log_embed.add_field(name="Score", value=f"{score}/{quiz.total_questions}", inline=True)
+            log_embed.add_field(name="Passed", value="✅ Yes" if passed else "❌ No", inline=True)
+            log_embed.add_field(name="Quiz ID", value=quiz.id, inline=True)
+            log_embed.timestamp = discord.utils.utcnow()
+            
+            # Batched with other attempts into multi-embed messages
+            interaction.client.log_dispatcher.submit(interaction.guild.id, log_channel.id, log_embed)
 
 async def setup(bot):
     await bot.add_cog(Rolevia(bot))
\ No newline at end of file
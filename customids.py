@@ -0,0 +1,83 @@
+import calendar
+import hashlib
+import hmac
+import time
+from typing import NamedTuple, Optional
+
+ANSWER_PREFIX = "rv:a:"
+LOGS_PREFIX = "rv:l:"
+# Previous answers travel as one base36 digit per question (max 25 options per question)
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+class LogsCursor(NamedTuple):
+    direction: str
+    timestamp: str
+    row_id: int
+    user_id: Optional[int]
+    quiz_id: Optional[int]
+    passed: Optional[bool]
+
+class AnswerState(NamedTuple):
+    quiz_id: int
+    question_index: int
+    score: int
+    option: int
+    answers: bytes
+
+def _signature(secret: bytes, user_id: int, payload: str) -> str:
+    # Bound to the user, so a custom_id cannot be replayed by someone else
+    digest = hmac.new(secret, f"{user_id}:{payload}".encode(), hashlib.sha256).hexdigest()
+    return digest[:16]
+
+def encode_answer(secret: bytes, user_id: int, quiz_id: int, question_index: int, score: int, option: int, answers: bytes = b"") -> str:
+    history = "".join(_DIGITS[answer] for answer in answers)
+    payload = f"{quiz_id:x}:{question_index:x}:{score:x}:{option:x}:{history}"
+    return f"{ANSWER_PREFIX}{payload}:{_signature(secret, user_id, payload)}"
+
+def decode_answer(secret: bytes, user_id: int, custom_id: str) -> Optional[AnswerState]:
+    if not custom_id.startswith(ANSWER_PREFIX):
+        return None
+    payload, _, signature = custom_id[len(ANSWER_PREFIX):].rpartition(':')
+    if not hmac.compare_digest(signature, _signature(secret, user_id, payload)):
+        return None
+    try:
+        quiz_id, question_index, score, option, history = payload.split(':')
+        answers = bytes(int(digit, 36) for digit in history)
+        return AnswerState(int(quiz_id, 16), int(question_index, 16), int(score, 16), int(option, 16), answers)
+    except ValueError:
+        return None
+
+def _optional_hex(value: Optional[int]) -> str:
+    return "" if value is None else f"{value:x}"
+
+def encode_logs_cursor(direction: str, timestamp: str, row_id: int, user_id: Optional[int], quiz_id: Optional[int], passed: Optional[bool]) -> str:
+    # direction is 'b' (older than the key) or 'a' (newer than the key). The
+    # timestamp travels as epoch seconds to stay well within 100 characters.
+    epoch = calendar.timegm(time.strptime(timestamp, '%Y-%m-%d %H:%M:%S'))
+    result = "" if passed is None else str(int(passed))
+    return f"{LOGS_PREFIX}{direction}:{epoch:x}:{row_id:x}:{_optional_hex(user_id)}:{_optional_hex(quiz_id)}:{result}"
+
+def decode_logs_cursor(custom_id: str) -> Optional[LogsCursor]:
+    if not custom_id.startswith(LOGS_PREFIX):
+        return None
+    try:
+        direction, epoch, row_id, user_id, quiz_id, passed = custom_id[len(LOGS_PREFIX):].split(':')
+        if direction not in ('a', 'b'):
+            return None
+        return LogsCursor(
+            direction,
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(int(epoch, 16))),
+            int(row_id, 16),
+            int(user_id, 16) if user_id else None,
+            int(quiz_id, 16) if quiz_id else None,
+            bool(int(passed)) if passed else None
+        )
+    except ValueError:
+        return None
+
+def derive_secret(config) -> bytes:
+    # An explicit quiz_secret wins; otherwise derive a stable one from the bot token
+    secret = getattr(config, 'quiz_secret', None)
+    if secret:
+        return secret.encode() if isinstance(secret, str) else secret
+    return hashlib.sha256(f"rolevia:{config.token}".encode()).digest()
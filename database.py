@@ -1,97 +1,933 @@
 import sqlite3
 import json
 import asyncio
-from typing import Optional, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, List, Dict, Any, Tuple, Iterator
 import threading
+import queue
+import time
+import sys
+import os
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from metrics import metrics
+from dbwriter import WriterClient
 
-class Database:
-    def __init__(self, db_path: str = "rolevia.db"):
+_MISSING = object()
+
+# Ordered schema migrations. The position in this list (1-based) is the
+# PRAGMA user_version a database has once the migration is applied, so new
+# migrations must only ever be appended.
+MIGRATIONS = [
+    # 1: base tables
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            questions TEXT NOT NULL,
+            role_id INTEGER NOT NULL,
+            passing_percentage INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            log_channel_id INTEGER,
+            webhook_url TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            quiz_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            total_questions INTEGER NOT NULL,
+            passed BOOLEAN NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (quiz_id) REFERENCES quiz_data (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_messages (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            quiz_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (quiz_id) REFERENCES quiz_data (id)
+        )
+        ''',
+    ),
+    # 2: indexes for the guild/time, guild/user and per-quiz lookups
+    (
+        'CREATE INDEX IF NOT EXISTS idx_quiz_logs_guild_time ON quiz_logs (guild_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_logs_guild_user ON quiz_logs (guild_id, user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_logs_quiz_time ON quiz_logs (quiz_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_messages_quiz ON quiz_messages (quiz_id)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_messages_guild ON quiz_messages (guild_id, channel_id)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_data_guild ON quiz_data (guild_id)',
+    ),
+    # 3: durable role grant outcomes, pending rows are replayed after a restart
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS role_grants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            quiz_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_role_grants_status ON role_grants (status, guild_id)',
+    ),
+    # 4: per-quiz, per-day aggregates kept up to date by write_attempts, backfilled from existing logs
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_stats_daily (
+            quiz_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            passes INTEGER NOT NULL DEFAULT 0,
+            score_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quiz_id, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_score_histogram (
+            quiz_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quiz_id, day, score)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR IGNORE INTO quiz_stats_daily (quiz_id, day, guild_id, attempts, passes, score_sum)
+        SELECT quiz_id, date(timestamp), MIN(guild_id), COUNT(*), SUM(passed), SUM(score)
+        FROM quiz_logs
+        GROUP BY quiz_id, date(timestamp)
+        ''',
+        '''
+        INSERT OR IGNORE INTO quiz_score_histogram (quiz_id, day, score, attempts)
+        SELECT quiz_id, date(timestamp), score, COUNT(*)
+        FROM quiz_logs
+        GROUP BY quiz_id, date(timestamp), score
+        ''',
+    ),
+    # 5: per-question telemetry, one byte per question (chosen option, 0 = none)
+    # plus a bitmask of correctly answered questions
+    (
+        'ALTER TABLE quiz_logs ADD COLUMN answers BLOB',
+        'ALTER TABLE quiz_logs ADD COLUMN correct_mask INTEGER',
+    ),
+    # 6: passed/failed filter for the attempt history viewer
+    (
+        'CREATE INDEX IF NOT EXISTS idx_quiz_logs_guild_passed ON quiz_logs (guild_id, passed, timestamp)',
+    ),
+    # 7: small key/value store for bot-wide state, e.g. the synced command tree hash
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ),
+    # 8: per-guild attempt retention, and per-question daily counts that keep
+    # question difficulty stats once the attempts they came from are pruned
+    (
+        'ALTER TABLE guild_settings ADD COLUMN retention_days INTEGER',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_answer_daily (
+            quiz_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            question INTEGER NOT NULL,
+            option INTEGER NOT NULL,
+            picks INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quiz_id, day, question, option)
+        ) WITHOUT ROWID
+        ''',
+    ),
+]
+
+class LRUCache:
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default=None):
+        with self.lock:
+            value = self.data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+    
+    def invalidate(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class MessageIndex:
+    # message_id -> quiz_id for every quiz message, so start-button clicks never
+    # query SQLite. The bulk-loaded snapshot is kept in two sorted arrays (16
+    # bytes per message); messages saved since then live in a small dict, where
+    # 0 marks an invalidated message.
+    def __init__(self):
+        self.message_ids = array('q')
+        self.quiz_ids = array('q')
+        self.recent: Dict[int, int] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def load(self, rows):
+        # rows are (message_id, quiz_id) pairs sorted by message_id
+        message_ids, quiz_ids = array('q'), array('q')
+        for message_id, quiz_id in rows:
+            message_ids.append(message_id)
+            quiz_ids.append(quiz_id)
+        with self.lock:
+            self.message_ids, self.quiz_ids = message_ids, quiz_ids
+            self.recent.clear()
+    
+    def _lookup(self, key) -> int:
+        value = self.recent.get(key)
+        if value is None:
+            index = bisect_left(self.message_ids, key)
+            if index < len(self.message_ids) and self.message_ids[index] == key:
+                value = self.quiz_ids[index]
+        return value or 0
+    
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return self._lookup(key) != 0
+    
+    def get(self, key, default=None):
+        with self.lock:
+            value = self._lookup(key)
+            if not value:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+    
+    def set(self, key, value):
+        with self.lock:
+            self.recent[key] = value
+    
+    def invalidate(self, key):
+        with self.lock:
+            self.recent[key] = 0
+    
+    def clear(self):
+        with self.lock:
+            self.message_ids, self.quiz_ids = array('q'), array('q')
+            self.recent.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                'loaded': len(self.message_ids),
+                'recent': len(self.recent),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class AttemptLogBuffer:
+    # Write-behind queue for quiz_logs. Attempts are committed in batches from a
+    # background thread once batch_size rows are pending or flush_interval elapses.
+    def __init__(self, database: 'Database', batch_size: int = 100, flush_interval: float = 1.0, max_retries: int = 5):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.pending = []
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.closed = False
+        self.peak_depth = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        # Batches are numbered per buffer so the writer can tell a resend of a
+        # batch it already committed (e.g. after a reply timeout) from a new one
+        self.source = uuid.uuid4().hex
+        self.sequence = 0
+        self.retry: Optional[Tuple[int, list]] = None
+        self.retry_errors = 0
+        self.thread = threading.Thread(target=self._run, name="rolevia-attempt-log", daemon=True)
+        self.thread.start()
+    
+    def add(self, row: tuple):
+        with self.condition:
+            self.pending.append(row)
+            depth = len(self.pending)
+            if depth > self.peak_depth:
+                self.peak_depth = depth
+            if depth >= self.batch_size:
+                self.condition.notify()
+    
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.closed and len(self.pending) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                closed = self.closed
+            try:
+                self.flush()
+            except Exception as exc:
+                # Never let the thread die, or attempts pile up until shutdown
+                print(f'Attempt log flush crashed: {exc.__class__.__name__}: {exc}')
+            if closed:
+                return
+    
+    def flush(self):
+        with self.write_lock:
+            while True:
+                if self.retry is None:
+                    with self.condition:
+                        rows, self.pending = self.pending, []
+                    if not rows:
+                        return
+                    self.sequence += 1
+                    self.retry = (self.sequence, rows)
+                sequence, rows = self.retry
+                
+                start = time.perf_counter()
+                try:
+                    self.database.write_attempt_batch(rows, self.source, sequence)
+                except sqlite3.OperationalError as exc:
+                    # Busy, locked or writer unavailable: transient and not the
+                    # batch's fault, so it is retried for as long as it takes
+                    self.failures += 1
+                    print(f'Failed to write {len(rows)} quiz attempts: {exc}')
+                    return
+                except Exception as exc:
+                    # Anything else (a constraint, a bad row) will likely fail again;
+                    # after max_retries the batch is dropped so newer attempts get through
+                    self.failures += 1
+                    self.retry_errors += 1
+                    if self.retry_errors < self.max_retries:
+                        print(f'Failed to write {len(rows)} quiz attempts: {exc.__class__.__name__}: {exc}')
+                        return
+                    self.dropped += len(rows)
+                    metrics.inc('rolevia_attempts_dropped_total', len(rows))
+                    print(f'Dropped {len(rows)} quiz attempts after {self.retry_errors} failed writes: {exc.__class__.__name__}: {exc}')
+                    self.retry = None
+                    self.retry_errors = 0
+                    continue
+                self.retry = None
+                self.retry_errors = 0
+                
+                self.flushed += len(rows)
+                self.batches += 1
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+    
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            depth = len(self.pending)
+        retry = self.retry
+        if retry is not None:
+            depth += len(retry[1])
+        return {
+            'queue_depth': depth,
+            'peak_depth': self.peak_depth,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'last_flush_ms': round(self.last_flush_ms, 3)
+        }
+
+class CompiledQuestion:
+    # Immutable, pre-processed form of one question. Options are stripped once
+    # and correct answers are a bitmask indexed by the 1-based option number.
+    __slots__ = ('text', 'options', 'correct_mask', 'imglink')
+    
+    def __init__(self, data: Dict[str, Any]):
+        self.text = data['question']
+        self.options = tuple(option.strip() for option in data['options'])
+        mask = 0
+        for answer in data['correct_answers']:
+            if int(answer) > 0:
+                mask |= 1 << int(answer)
+        self.correct_mask = mask
+        self.imglink = data.get('imglink') or None
+    
+    def is_correct(self, option: int) -> bool:
+        return (self.correct_mask >> option) & 1 == 1
+    
+    @property
+    def description(self) -> str:
+        options_text = "\n".join(f"{i}. {option}" for i, option in enumerate(self.options, 1))
+        return f"**{self.text}**\n\n{options_text}"
+    
+    @property
+    def correct_answers(self) -> List[int]:
+        return [i for i in range(1, len(self.options) + 1) if self.is_correct(i)]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'question': self.text,
+            'options': list(self.options),
+            'correct_answers': self.correct_answers,
+            'imglink': self.imglink or ''
+        }
+
+class CompiledQuiz:
+    __slots__ = ('id', 'guild_id', 'role_id', 'passing_percentage', 'created_at', 'questions', 'total_questions', 'required_correct')
+    
+    def __init__(self, quiz_id: int, guild_id: int, questions: List[Dict[str, Any]], role_id: int, passing_percentage: int, created_at: Optional[str] = None):
+        self.id = quiz_id
+        self.guild_id = guild_id
+        self.role_id = role_id
+        self.passing_percentage = passing_percentage
+        self.created_at = created_at
+        self.questions = tuple(CompiledQuestion(question) for question in questions)
+        self.total_questions = len(self.questions)
+        # Smallest integer score that satisfies score >= total * percentage / 100
+        self.required_correct = -(-self.total_questions * passing_percentage // 100)
+    
+    def is_passing(self, score: int) -> bool:
+        return score >= self.required_correct
+    
+    def grade(self, answers: bytes) -> Tuple[int, int]:
+        # Returns (score, mask) where bit i of mask is set if question i was answered correctly
+        score = 0
+        mask = 0
+        for index, (question, option) in enumerate(zip(self.questions, answers)):
+            if (question.correct_mask >> option) & 1:
+                score += 1
+                mask |= 1 << index
+        return score, mask
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'guild_id': self.guild_id,
+            'questions': [question.to_dict() for question in self.questions],
+            'role_id': self.role_id,
+            'passing_percentage': self.passing_percentage,
+            'created_at': self.created_at
+        }
+
+class GuildSettings:
+    __slots__ = ('guild_id', 'log_channel_id', 'webhook_url', 'retention_days')
+    
+    def __init__(self, guild_id: int, log_channel_id: Optional[int] = None, webhook_url: Optional[str] = None, retention_days: Optional[int] = None):
+        self.guild_id = guild_id
+        self.log_channel_id = log_channel_id
+        self.webhook_url = webhook_url
+        # None follows the bot-wide default, 0 keeps attempts forever
+        self.retention_days = retention_days
+
+class _StatementStats:
+    __slots__ = ('sql', 'method', 'calls', 'total', 'max', 'steps', 'slow')
+    
+    def __init__(self, sql: str, method: Optional[str]):
+        self.sql = sql
+        self.method = method
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.steps = 0
+        self.slow = 0
+
+class QueryProfiler:
+    # Opt-in per-statement profiling. Pooled connections opened while a profiler
+    # is set use ProfiledConnection, whose cursors time execute() and the fetches
+    # that follow it, and a progress handler counts VM steps. Bound values are
+    # only used for EXPLAIN and never logged, since they include webhook tokens.
+    def __init__(self, slow_ms: float = 50.0, log_size: int = 100, progress_steps: int = 1000):
+        self.slow_seconds = slow_ms / 1000
+        self.progress_steps = progress_steps
+        self.lock = threading.Lock()
+        self.statements: Dict[str, _StatementStats] = {}
+        self.slow_log = deque(maxlen=log_size)
+        self.plans: Dict[str, List[str]] = {}
+    
+    def attach(self, conn: 'ProfiledConnection'):
+        conn.profiler = self
+        conn.set_progress_handler(conn.progress, self.progress_steps)
+    
+    def record(self, cursor: 'ProfiledCursor', elapsed: float, steps: int, new_run: bool):
+        sql = cursor.profiled_sql
+        cursor.run_elapsed += elapsed
+        with self.lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = _StatementStats(sql, _calling_method())
+            if new_run:
+                stats.calls += 1
+            stats.total += elapsed
+            stats.steps += steps * self.progress_steps
+            if cursor.run_elapsed > stats.max:
+                stats.max = cursor.run_elapsed
+            slow = not cursor.run_logged and cursor.run_elapsed >= self.slow_seconds
+            if slow:
+                stats.slow += 1
+                cursor.run_logged = True
+        if slow:
+            self.log_slow(cursor, stats)
+    
+    def log_slow(self, cursor: 'ProfiledCursor', stats: _StatementStats):
+        conn = cursor.connection
+        plan = self.plans.get(stats.sql)
+        if plan is None and cursor.profiled_params is not None and stats.sql.split(None, 1)[0].upper() in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+            try:
+                # A plain Cursor so the EXPLAIN itself is not profiled
+                explain = sqlite3.Cursor(conn)
+                explain.execute(f'EXPLAIN QUERY PLAN {stats.sql}', cursor.profiled_params)
+                plan = [row[3] for row in explain.fetchall()]
+            except sqlite3.Error:
+                plan = []
+            self.plans[stats.sql] = plan
+        entry = {
+            'sql': stats.sql,
+            'method': _calling_method() or stats.method,
+            'ms': round(cursor.run_elapsed * 1000, 3),
+            'plan': plan or [],
+            'at': time.time()
+        }
+        self.slow_log.append(entry)
+        print(f"Slow query {entry['ms']}ms in {entry['method'] or '?'}: {stats.sql} | plan: {'; '.join(entry['plan']) or 'n/a'}")
+    
+    def report(self, limit: int = 20, order: str = 'total') -> List[Dict[str, Any]]:
+        with self.lock:
+            statements = sorted(self.statements.values(), key=lambda stats: getattr(stats, order), reverse=True)[:limit]
+            return [
+                {
+                    'sql': stats.sql,
+                    'method': stats.method,
+                    'calls': stats.calls,
+                    'total_ms': round(stats.total * 1000, 3),
+                    'mean_ms': round(stats.total * 1000 / stats.calls, 3) if stats.calls else None,
+                    'max_ms': round(stats.max * 1000, 3),
+                    'vm_steps': stats.steps,
+                    'slow': stats.slow
+                }
+                for stats in statements
+            ]
+    
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+            self.slow_log.clear()
+            self.plans.clear()
+
+def _calling_method() -> Optional[str]:
+    # Name of the innermost Database method on the stack
+    frame = sys._getframe(1)
+    while frame is not None:
+        if isinstance(frame.f_locals.get('self'), Database):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+class ProfiledCursor(sqlite3.Cursor):
+    # Each execute() starts a run; fetches add to the run until the next execute()
+    profiled_sql = ''
+    profiled_params = None
+    run_elapsed = 0.0
+    run_logged = False
+    
+    def _timed(self, func, *args, new_run: bool = False):
+        conn = self.connection
+        if conn.profiler is None:
+            # Still setting up the connection
+            return func(*args)
+        steps = conn.steps
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            conn.profiler.record(self, time.perf_counter() - started, conn.steps - steps, new_run)
+    
+    def _start(self, sql: str, params):
+        self.profiled_sql = ' '.join(sql.split())
+        self.profiled_params = params
+        self.run_elapsed = 0.0
+        self.run_logged = False
+    
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        return self._timed(super().execute, sql, parameters, new_run=True)
+    
+    def executemany(self, sql, seq_of_parameters):
+        # Parameters may be a one-shot iterator, so no plan is taken for these
+        self._start(sql, None)
+        return self._timed(super().executemany, sql, seq_of_parameters, new_run=True)
+    
+    def fetchone(self):
+        return self._timed(super().fetchone)
+    
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, size if size is not None else self.arraysize)
+    
+    def fetchall(self):
+        return self._timed(super().fetchall)
+    
+    def __next__(self):
+        return self._timed(super().__next__)
+
+class ProfiledConnection(sqlite3.Connection):
+    profiler = None
+    steps = 0
+    
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def progress(self) -> int:
+        self.steps += 1
+        return 0
+
+class StorageProfile:
+    # Pragmas applied to every pooled connection
+    def __init__(
+        self,
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size: int = -16000,
+        cached_statements: int = 256,
+        busy_timeout: int = 5000,
+        auto_vacuum: str = "INCREMENTAL"
+    ):
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.auto_vacuum = auto_vacuum
+
+class ConnectionPool:
+    # One writer connection shared behind a lock plus a bounded set of
+    # query-only reader connections, all opened with the same StorageProfile.
+    def __init__(self, db_path: str, readers: int = 4, profile: Optional[StorageProfile] = None, writable: bool = True):
         self.db_path = db_path
-        self.local = threading.local()
-        self.init_db()
+        self.max_readers = max(1, readers)
+        self.profile = profile or StorageProfile()
+        self.writer_lock = threading.RLock()
+        self.readers_lock = threading.Lock()
+        self.idle_readers = queue.LifoQueue()
+        self.reader_count = 0
+        self.closed = False
+        self.profiler: Optional[QueryProfiler] = None
+        # Cluster processes open readers only; their writes go to the writer process
+        self.writer_conn = self._connect(readonly=False) if writable else None
     
-    def get_connection(self):
-        if not hasattr(self.local, 'conn'):
-            self.local.conn = sqlite3.connect(self.db_path)
-            self.local.conn.row_factory = sqlite3.Row
-        return self.local.conn
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        profile = self.profile
+        profiler = self.profiler
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=profile.busy_timeout / 1000,
+            check_same_thread=False,
+            cached_statements=profile.cached_statements,
+            factory=ProfiledConnection if profiler else sqlite3.Connection
+        )
+        conn.row_factory = sqlite3.Row
+        if not readonly:
+            # Only takes effect on a new database; existing files are converted
+            # by Database.enable_incremental_vacuum()
+            conn.execute(f'PRAGMA auto_vacuum = {profile.auto_vacuum}')
+            conn.execute(f'PRAGMA journal_mode = {profile.journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {profile.synchronous}')
+        conn.execute(f'PRAGMA mmap_size = {int(profile.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size = {int(profile.cache_size)}')
+        conn.execute(f'PRAGMA busy_timeout = {int(profile.busy_timeout)}')
+        if readonly:
+            conn.execute('PRAGMA query_only = ON')
+        if profiler:
+            profiler.attach(conn)
+        return conn
     
-    def init_db(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    @contextmanager
+    def writer(self):
+        with self.writer_lock:
+            if self.closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            if self.writer_conn is None:
+                raise sqlite3.ProgrammingError("This connection pool is read-only")
+            yield self.writer_conn
+    
+    @contextmanager
+    def reader(self):
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        if self.closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        try:
+            return self.idle_readers.get_nowait()
+        except queue.Empty:
+            pass
         
-        # Create tables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                questions TEXT NOT NULL,
-                role_id INTEGER NOT NULL,
-                passing_percentage INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with self.readers_lock:
+            if self.reader_count < self.max_readers:
+                self.reader_count += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect(readonly=True)
+            except sqlite3.Error:
+                with self.readers_lock:
+                    self.reader_count -= 1
+                raise
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS guild_settings (
-                guild_id INTEGER PRIMARY KEY,
-                log_channel_id INTEGER,
-                webhook_url TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                quiz_id INTEGER NOT NULL,
-                score INTEGER NOT NULL,
-                total_questions INTEGER NOT NULL,
-                passed BOOLEAN NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (quiz_id) REFERENCES quiz_data (id)
-            )
-        ''')
+        try:
+            return self.idle_readers.get(timeout=self.profile.busy_timeout / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a reader connection")
+    
+    def _release_reader(self, conn: sqlite3.Connection):
+        if self.closed:
+            conn.close()
+            return
+        if getattr(conn, 'profiler', None) is not self.profiler:
+            # Opened before profiling was switched on or off
+            conn.close()
+            with self.readers_lock:
+                self.reader_count -= 1
+            return
+        self.idle_readers.put(conn)
+    
+    def set_profiler(self, profiler: Optional['QueryProfiler']):
+        # Connections are reopened with the matching factory: the writer and
+        # idle readers now, busy readers when they are released
+        with self.writer_lock:
+            if self.closed:
+                return
+            self.profiler = profiler
+            if self.writer_conn is not None:
+                self.writer_conn.close()
+                self.writer_conn = self._connect(readonly=False)
+        while True:
+            try:
+                conn = self.idle_readers.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.readers_lock:
+                self.reader_count -= 1
+    
+    def health_check(self) -> Dict[str, Any]:
+        result = {'writer': False, 'readers_ok': 0, 'readers_replaced': 0}
+        if self.writer_conn is not None:
+            with self.writer() as conn:
+                try:
+                    conn.execute('SELECT 1').fetchone()
+                    result['writer'] = True
+                    result['journal_mode'] = conn.execute('PRAGMA journal_mode').fetchone()[0]
+                except sqlite3.Error:
+                    # The writer is never handed out without its lock, so it can be swapped here
+                    try:
+                        conn.close()
+                    except sqlite3.Error:
+                        pass
+                    self.writer_conn = self._connect(readonly=False)
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_messages (
-                message_id INTEGER PRIMARY KEY,
-                channel_id INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                quiz_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (quiz_id) REFERENCES quiz_data (id)
-            )
-        ''')
+        idle = []
+        while True:
+            try:
+                idle.append(self.idle_readers.get_nowait())
+            except queue.Empty:
+                break
+        for conn in idle:
+            try:
+                conn.execute('SELECT 1').fetchone()
+                result['readers_ok'] += 1
+            except sqlite3.Error:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                conn = self._connect(readonly=True)
+                result['readers_replaced'] += 1
+            self.idle_readers.put(conn)
         
-        conn.commit()
+        result['readers_open'] = self.reader_count
+        result['readers_max'] = self.max_readers
+        return result
     
-    def save_quiz(self, guild_id: int, questions: List[Dict], role_id: int, passing_percentage: int) -> int:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def close(self):
+        with self.writer_lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.writer_conn is not None:
+                self.writer_conn.close()
+        while True:
+            try:
+                self.idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+class Database:
+    def __init__(
+        self,
+        db_path: str = "rolevia.db",
+        quiz_cache_size: int = 256,
+        readers: int = 4,
+        profile: Optional[StorageProfile] = None,
+        profiler: Optional[QueryProfiler] = None,
+        writer_socket: Optional[str] = None
+    ):
+        self.db_path = db_path
+        # With a writer socket this process only reads; every write is sent to
+        # the cluster's writer process, which owns the database file
+        self.remote = WriterClient(writer_socket) if writer_socket else None
+        self.pool = ConnectionPool(db_path, readers, profile, writable=self.remote is None)
+        if profiler:
+            self.pool.set_profiler(profiler)
+        self.quiz_cache = LRUCache(quiz_cache_size)
+        self.message_cache = MessageIndex()
+        self.guild_settings: Dict[int, GuildSettings] = {}
+        self.init_db()
+        self.load_guild_settings()
+        self.load_message_index()
+        self.attempt_log = AttemptLogBuffer(self)
+    
+    def init_db(self):
+        # The writer process migrates before any cluster process starts
+        if self.remote is None:
+            self.migrate()
+    
+    def get_schema_version(self) -> int:
+        with self.pool.reader() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def migrate(self):
+        with self.pool.writer() as conn:
+            version = self.get_schema_version()
+            
+            # Each migration runs in its own transaction together with the version bump
+            for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                cursor = conn.cursor()
+                cursor.execute('BEGIN')
+                try:
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(f'PRAGMA user_version = {target}')
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+                conn.commit()
+    
+    def explain_query_plan(self, sql: str, params: tuple = ()) -> List[str]:
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row['detail'] for row in cursor.fetchall()]
+    
+    def _insert_quiz(self, cursor: sqlite3.Cursor, guild_id: int, questions: List[Dict], role_id: int, passing_percentage: int) -> int:
         cursor.execute('''
             INSERT INTO quiz_data (guild_id, questions, role_id, passing_percentage)
             VALUES (?, ?, ?, ?)
         ''', (guild_id, json.dumps(questions), role_id, passing_percentage))
-        
-        quiz_id = cursor.lastrowid
-        conn.commit()
+        return cursor.lastrowid
+    
+    def save_quiz(self, guild_id: int, questions: List[Dict], role_id: int, passing_percentage: int) -> int:
+        if self.remote:
+            quiz_id = self.remote.call('save_quiz', guild_id, questions, role_id, passing_percentage)
+        else:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                quiz_id = self._insert_quiz(cursor, guild_id, questions, role_id, passing_percentage)
+                conn.commit()
+        self.quiz_cache.invalidate(quiz_id)
         return quiz_id
     
-    def get_quiz(self, quiz_id: int) -> Optional[Dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM quiz_data WHERE id = ?
-        ''', (quiz_id,))
-        
-        row = cursor.fetchone()
-        if row:
-            return {
+    def save_quizzes(self, guild_id: int, quizzes: List[Dict]) -> List[int]:
+        # All or nothing: every quiz is inserted in a single transaction
+        if self.remote:
+            quiz_ids = self.remote.call('save_quizzes', guild_id, quizzes)
+        else:
+            with self.pool.writer() as conn, conn:
+                cursor = conn.cursor()
+                quiz_ids = [
+                    self._insert_quiz(cursor, guild_id, quiz['questions'], quiz['role_id'], quiz['passing_percentage'])
+                    for quiz in quizzes
+                ]
+        for quiz_id in quiz_ids:
+            self.quiz_cache.invalidate(quiz_id)
+        return quiz_ids
+    
+    def get_guild_quizzes(self, guild_id: int) -> List[Dict]:
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM quiz_data WHERE guild_id = ? ORDER BY id
+            ''', (guild_id,))
+            
+            rows = cursor.fetchall()
+        return [
+            {
                 'id': row['id'],
                 'guild_id': row['guild_id'],
                 'questions': json.loads(row['questions']),
@@ -99,98 +935,838 @@ class Database:
                 'passing_percentage': row['passing_percentage'],
                 'created_at': row['created_at']
             }
+            for row in rows
+        ]
+    
+    def get_compiled_quiz(self, quiz_id: int) -> Optional[CompiledQuiz]:
+        quiz = self.quiz_cache.get(quiz_id)
+        if quiz is not None:
+            return quiz
+        return self.load_compiled_quiz(quiz_id)
+    
+    def load_compiled_quiz(self, quiz_id: int) -> Optional[CompiledQuiz]:
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM quiz_data WHERE id = ?
+            ''', (quiz_id,))
+            
+            row = cursor.fetchone()
+        if row:
+            quiz = CompiledQuiz(
+                row['id'],
+                row['guild_id'],
+                json.loads(row['questions']),
+                row['role_id'],
+                row['passing_percentage'],
+                row['created_at']
+            )
+            self.quiz_cache.set(quiz_id, quiz)
+            return quiz
         return None
     
+    def get_quiz(self, quiz_id: int) -> Optional[Dict]:
+        # Compatibility path for callers that want the stored dict shape: it
+        # rebuilds the dict on every call, so hot paths use get_compiled_quiz
+        quiz = self.get_compiled_quiz(quiz_id)
+        return quiz.to_dict() if quiz else None
+    
+    def load_guild_settings(self):
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT guild_id, log_channel_id, webhook_url, retention_days FROM guild_settings
+            ''')
+            
+            self.guild_settings = {
+                row['guild_id']: GuildSettings(row['guild_id'], row['log_channel_id'], row['webhook_url'], row['retention_days'])
+                for row in cursor.fetchall()
+            }
+    
+    def get_guild_settings(self, guild_id: int) -> GuildSettings:
+        settings = self.guild_settings.get(guild_id)
+        if settings is None:
+            settings = self.guild_settings.setdefault(guild_id, GuildSettings(guild_id))
+        return settings
+    
     def set_log_channel(self, guild_id: int, channel_id: int):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO guild_settings (guild_id, log_channel_id, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (guild_id, channel_id))
-        
-        conn.commit()
+        if self.remote:
+            self.remote.call('set_log_channel', guild_id, channel_id)
+        else:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO guild_settings (guild_id, log_channel_id, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (guild_id) DO UPDATE SET
+                        log_channel_id = excluded.log_channel_id,
+                        updated_at = excluded.updated_at
+                ''', (guild_id, channel_id))
+                
+                conn.commit()
+        self.get_guild_settings(guild_id).log_channel_id = channel_id
     
     def get_log_channel(self, guild_id: int) -> Optional[int]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT log_channel_id FROM guild_settings WHERE guild_id = ?
-        ''', (guild_id,))
-        
-        row = cursor.fetchone()
-        return row['log_channel_id'] if row and row['log_channel_id'] else None
+        settings = self.guild_settings.get(guild_id)
+        return settings.log_channel_id if settings and settings.log_channel_id else None
     
     def set_webhook_url(self, guild_id: int, webhook_url: str):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO guild_settings (guild_id, webhook_url, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (guild_id, webhook_url))
-        
-        conn.commit()
+        if self.remote:
+            self.remote.call('set_webhook_url', guild_id, webhook_url)
+        else:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO guild_settings (guild_id, webhook_url, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (guild_id) DO UPDATE SET
+                        webhook_url = excluded.webhook_url,
+                        updated_at = excluded.updated_at
+                ''', (guild_id, webhook_url))
+                
+                conn.commit()
+        self.get_guild_settings(guild_id).webhook_url = webhook_url
     
     def get_webhook_url(self, guild_id: int) -> Optional[str]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT webhook_url FROM guild_settings WHERE guild_id = ?
-        ''', (guild_id,))
-        
-        row = cursor.fetchone()
-        return row['webhook_url'] if row and row['webhook_url'] else None
+        settings = self.guild_settings.get(guild_id)
+        return settings.webhook_url if settings and settings.webhook_url else None
+    
+    def set_retention_days(self, guild_id: int, days: Optional[int]):
+        if self.remote:
+            self.remote.call('set_retention_days', guild_id, days)
+        else:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO guild_settings (guild_id, retention_days, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (guild_id) DO UPDATE SET
+                        retention_days = excluded.retention_days,
+                        updated_at = excluded.updated_at
+                ''', (guild_id, days))
+                
+                conn.commit()
+        self.get_guild_settings(guild_id).retention_days = days
     
-    def log_quiz_attempt(self, guild_id: int, user_id: int, quiz_id: int, score: int, total_questions: int, passed: bool):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_retention_days(self, guild_id: int) -> Optional[int]:
+        settings = self.guild_settings.get(guild_id)
+        return settings.retention_days if settings else None
+    
+    def get_state(self, key: str) -> Optional[str]:
+        with self.pool.reader() as conn:
+            row = conn.execute('SELECT value FROM bot_state WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+    
+    def set_state(self, key: str, value: str):
+        if self.remote:
+            self.remote.call('set_state', key, value)
+            return
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO bot_state (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = excluded.updated_at
+            ''', (key, value))
+            
+            conn.commit()
+    
+    def log_quiz_attempt(self, guild_id: int, user_id: int, quiz_id: int, score: int, total_questions: int, passed: bool, answers: Optional[bytes] = None, correct_mask: Optional[int] = None):
+        # Timestamp is taken now, not when the batch is written
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        self.attempt_log.add((guild_id, user_id, quiz_id, score, total_questions, passed, timestamp, answers, correct_mask))
+    
+    def write_attempt_batch(self, rows: List[tuple], source: Optional[str] = None, sequence: Optional[int] = None):
+        # With a source, the last committed sequence number is stored in
+        # bot_state in the same transaction, so resending a batch is a no-op
+        if self.remote:
+            self.remote.call('write_attempt_batch', rows, source, sequence)
+            return
+        with self.pool.writer() as conn, conn:
+            if source is not None:
+                key = f'attempt_batch:{source}'
+                row = conn.execute('SELECT value FROM bot_state WHERE key = ?', (key,)).fetchone()
+                if row is not None and int(row['value']) >= sequence:
+                    return
+                if row is None:
+                    # A new buffer, i.e. a process start: forget sources idle for a week
+                    conn.execute('''
+                        DELETE FROM bot_state
+                        WHERE key >= 'attempt_batch:' AND key < 'attempt_batch;'
+                          AND updated_at < datetime('now', '-7 days')
+                    ''')
+                conn.execute('''
+                    INSERT INTO bot_state (key, value, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (key) DO UPDATE SET
+                        value = excluded.value,
+                        updated_at = excluded.updated_at
+                ''', (key, str(sequence)))
+            self.write_attempts(conn, rows)
+    
+    def write_attempts(self, conn: sqlite3.Connection, rows: List[tuple]):
+        # Runs inside the caller's transaction so logs and aggregates never disagree
+        conn.executemany('''
+            INSERT INTO quiz_logs (guild_id, user_id, quiz_id, score, total_questions, passed, timestamp, answers, correct_mask)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
         
-        cursor.execute('''
-            INSERT INTO quiz_logs (guild_id, user_id, quiz_id, score, total_questions, passed)
+        daily = {}
+        histogram = {}
+        for guild_id, _, quiz_id, score, _, passed, timestamp, _, _ in rows:
+            day = timestamp[:10]
+            totals = daily.setdefault((quiz_id, day), [guild_id, 0, 0, 0])
+            totals[1] += 1
+            totals[2] += 1 if passed else 0
+            totals[3] += score
+            histogram[(quiz_id, day, score)] = histogram.get((quiz_id, day, score), 0) + 1
+        
+        conn.executemany('''
+            INSERT INTO quiz_stats_daily (quiz_id, day, guild_id, attempts, passes, score_sum)
             VALUES (?, ?, ?, ?, ?, ?)
-        ''', (guild_id, user_id, quiz_id, score, total_questions, passed))
+            ON CONFLICT (quiz_id, day) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                passes = passes + excluded.passes,
+                score_sum = score_sum + excluded.score_sum
+        ''', [(quiz_id, day, *totals) for (quiz_id, day), totals in daily.items()])
         
-        conn.commit()
+        conn.executemany('''
+            INSERT INTO quiz_score_histogram (quiz_id, day, score, attempts)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (quiz_id, day, score) DO UPDATE SET
+                attempts = attempts + excluded.attempts
+        ''', [(*key, count) for key, count in histogram.items()])
     
-    def get_quiz_logs(self, guild_id: int, limit: int = 50) -> List[Dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_quiz_stats(self, quiz_id: int) -> Dict[str, Any]:
+        self.attempt_log.flush()
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT COALESCE(SUM(attempts), 0) AS attempts,
+                       COALESCE(SUM(passes), 0) AS passes,
+                       COALESCE(SUM(score_sum), 0) AS score_sum,
+                       MIN(day) AS first_day,
+                       MAX(day) AS last_day
+                FROM quiz_stats_daily
+                WHERE quiz_id = ?
+            ''', (quiz_id,))
+            stats = dict(cursor.fetchone())
+            
+            cursor.execute('''
+                SELECT score, SUM(attempts) AS attempts
+                FROM quiz_score_histogram
+                WHERE quiz_id = ?
+                GROUP BY score
+                ORDER BY score
+            ''', (quiz_id,))
+            stats['histogram'] = {row['score']: row['attempts'] for row in cursor.fetchall()}
+        return stats
+    
+    def get_question_difficulty(self, quiz: CompiledQuiz) -> Dict[str, Any]:
+        # One indexed pass over the quiz's attempts. Every per-question and
+        # per-option count is a column aggregate evaluated inside SQLite, so no
+        # rows are materialized in Python regardless of the attempt count.
+        columns = ['COUNT(*)']
+        for index, question in enumerate(quiz.questions):
+            columns.append(f'SUM((correct_mask >> {index}) & 1)')
+            for option in range(1, len(question.options) + 1):
+                columns.append(f"SUM(substr(answers, {index + 1}, 1) = x'{option:02x}')")
         
-        cursor.execute('''
-            SELECT * FROM quiz_logs 
-            WHERE guild_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (guild_id, limit))
+        self.attempt_log.flush()
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(columns)}
+                FROM quiz_logs
+                WHERE quiz_id = ? AND answers IS NOT NULL
+            ''', (quiz.id,))
+            values = iter(cursor.fetchone())
+            
+            # Attempts removed by retention live on as per-question daily counts
+            cursor.execute('''
+                SELECT question, option, SUM(picks) AS picks, SUM(correct) AS correct
+                FROM quiz_answer_daily
+                WHERE quiz_id = ?
+                GROUP BY question, option
+            ''', (quiz.id,))
+            rolled_up = {(row['question'], row['option']): (row['picks'], row['correct']) for row in cursor.fetchall()}
         
-        rows = cursor.fetchall()
+        attempts = next(values) + sum(picks for (question, _), (picks, _) in rolled_up.items() if question == 0)
+        questions = []
+        for index, question in enumerate(quiz.questions):
+            correct = (next(values) or 0) + sum(correct for (number, _), (_, correct) in rolled_up.items() if number == index)
+            picks = [(next(values) or 0) + rolled_up.get((index, option), (0, 0))[0] for option in range(1, len(question.options) + 1)]
+            questions.append({
+                'correct': correct,
+                'correct_rate': correct / attempts if attempts else 0.0,
+                'picks': picks
+            })
+        return {'attempts': attempts, 'questions': questions}
+    
+    def get_quiz_logs(self, guild_id: int, limit: int = 50) -> List[Dict]:
+        self.attempt_log.flush()
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM quiz_logs 
+                WHERE guild_id = ? 
+                ORDER BY timestamp DESC 
+                LIMIT ?
+            ''', (guild_id, limit))
+            
+            rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
-    def save_quiz_message(self, message_id: int, channel_id: int, guild_id: int, quiz_id: int):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def iter_quiz_logs(self, guild_id: int, page_size: int = 1000) -> Iterator[Dict]:
+        # Keyset pagination on (timestamp, id) through idx_quiz_logs_guild_time.
+        # Each page borrows a reader only for its own query, so a long export
+        # never holds a read transaction open.
+        self.attempt_log.flush()
+        cursor_key = None
+        while True:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                if cursor_key is None:
+                    cursor.execute('''
+                        SELECT * FROM quiz_logs
+                        WHERE guild_id = ?
+                        ORDER BY timestamp, id
+                        LIMIT ?
+                    ''', (guild_id, page_size))
+                else:
+                    cursor.execute('''
+                        SELECT * FROM quiz_logs
+                        WHERE guild_id = ? AND (timestamp, id) > (?, ?)
+                        ORDER BY timestamp, id
+                        LIMIT ?
+                    ''', (guild_id, *cursor_key, page_size))
+                rows = cursor.fetchall()
+            
+            for row in rows:
+                yield dict(row)
+            if len(rows) < page_size:
+                return
+            cursor_key = (rows[-1]['timestamp'], rows[-1]['id'])
+    
+    def get_quiz_logs_page(
+        self,
+        guild_id: int,
+        user_id: Optional[int] = None,
+        quiz_id: Optional[int] = None,
+        passed: Optional[bool] = None,
+        before: Optional[Tuple[str, int]] = None,
+        after: Optional[Tuple[str, int]] = None,
+        limit: int = 10
+    ) -> Tuple[List[Dict], bool]:
+        # Newest-first page of attempts. `before`/`after` are (timestamp, id) keys
+        # of the last/first row of an adjacent page, so any page costs one index
+        # seek. Returns the rows and whether more rows exist in that direction.
+        self.attempt_log.flush()
+        conditions = ['guild_id = ?']
+        params: List[Any] = [guild_id]
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        if quiz_id is not None:
+            conditions.append('quiz_id = ?')
+            params.append(quiz_id)
+        if passed is not None:
+            conditions.append('passed = ?')
+            params.append(int(passed))
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO quiz_messages (message_id, channel_id, guild_id, quiz_id)
-            VALUES (?, ?, ?, ?)
-        ''', (message_id, channel_id, guild_id, quiz_id))
+        order = 'DESC'
+        if before is not None:
+            conditions.append('(timestamp, id) < (?, ?)')
+            params.extend(before)
+        elif after is not None:
+            # Walk towards newer rows, then flip back to newest-first below
+            conditions.append('(timestamp, id) > (?, ?)')
+            params.extend(after)
+            order = 'ASC'
+        params.append(limit + 1)
+        
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT * FROM quiz_logs
+                WHERE {' AND '.join(conditions)}
+                ORDER BY timestamp {order}, id {order}
+                LIMIT ?
+            ''', params)
+            rows = [dict(row) for row in cursor.fetchall()]
         
-        conn.commit()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if order == 'ASC':
+            rows.reverse()
+        return rows, has_more
+    
+    def save_quiz_message(self, message_id: int, channel_id: int, guild_id: int, quiz_id: int):
+        if self.remote:
+            self.remote.call('save_quiz_message', message_id, channel_id, guild_id, quiz_id)
+        else:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO quiz_messages (message_id, channel_id, guild_id, quiz_id)
+                    VALUES (?, ?, ?, ?)
+                ''', (message_id, channel_id, guild_id, quiz_id))
+                
+                conn.commit()
+        self.message_cache.set(message_id, quiz_id)
+    
+    def save_quiz_messages(self, rows: List[tuple]):
+        # rows are (message_id, channel_id, guild_id, quiz_id), written in one transaction
+        if self.remote:
+            self.remote.call('save_quiz_messages', rows)
+        else:
+            with self.pool.writer() as conn, conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO quiz_messages (message_id, channel_id, guild_id, quiz_id)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+        for message_id, _, _, quiz_id in rows:
+            self.message_cache.set(message_id, quiz_id)
+    
+    def create_role_grant(self, guild_id: int, user_id: int, role_id: int, quiz_id: Optional[int] = None) -> int:
+        if self.remote:
+            return self.remote.call('create_role_grant', guild_id, user_id, role_id, quiz_id)
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO role_grants (guild_id, user_id, role_id, quiz_id)
+                VALUES (?, ?, ?, ?)
+            ''', (guild_id, user_id, role_id, quiz_id))
+            
+            grant_id = cursor.lastrowid
+            conn.commit()
+        return grant_id
+    
+    def update_role_grant(self, grant_id: int, status: str, attempts: int, last_error: Optional[str] = None):
+        if self.remote:
+            self.remote.call('update_role_grant', grant_id, status, attempts, last_error)
+            return
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE role_grants
+                SET status = ?, attempts = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, attempts, last_error, grant_id))
+            
+            conn.commit()
+    
+    def get_pending_role_grants(self) -> List[Dict]:
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM role_grants WHERE status = 'pending' ORDER BY id
+            ''')
+            
+            rows = cursor.fetchall()
+        return [dict(row) for row in rows]
+    
+    def load_message_index(self) -> int:
+        # One ordered scan of the quiz_messages primary key at startup
+        with self.pool.reader() as conn:
+            cursor = conn.execute('SELECT message_id, quiz_id FROM quiz_messages ORDER BY message_id')
+            self.message_cache.load(cursor)
+        return len(self.message_cache.message_ids)
     
     def get_quiz_from_message(self, message_id: int) -> Optional[int]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        quiz_id = self.message_cache.get(message_id)
+        if quiz_id is not None:
+            return quiz_id
         
-        cursor.execute('''
-            SELECT quiz_id FROM quiz_messages WHERE message_id = ?
-        ''', (message_id,))
+        # Messages saved by another process since startup
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT quiz_id FROM quiz_messages WHERE message_id = ?
+            ''', (message_id,))
+            
+            row = cursor.fetchone()
+        if row:
+            self.message_cache.set(message_id, row['quiz_id'])
+            return row['quiz_id']
+        return None
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            'quizzes': self.quiz_cache.stats(),
+            'messages': self.message_cache.stats()
+        }
+    
+    def attempt_log_stats(self) -> Dict[str, Any]:
+        return self.attempt_log.stats()
+    
+    def delete_quiz_messages(self, message_ids: List[int]):
+        # Mappings for messages deleted on Discord
+        if self.remote:
+            self.remote.call('delete_quiz_messages', message_ids)
+        else:
+            with self.pool.writer() as conn, conn:
+                conn.executemany('DELETE FROM quiz_messages WHERE message_id = ?', ((message_id,) for message_id in message_ids))
+        for message_id in message_ids:
+            self.message_cache.invalidate(message_id)
+    
+    def delete_orphaned_quiz_messages(self, batch_size: int = 500) -> List[int]:
+        # Mappings whose quiz no longer exists, one short transaction per call.
+        # The removed ids are returned so cluster processes can drop them too.
+        if self.remote:
+            message_ids = self.remote.call('delete_orphaned_quiz_messages', batch_size)
+        else:
+            with self.pool.writer() as conn, conn:
+                message_ids = [row[0] for row in conn.execute('''
+                    SELECT message_id FROM quiz_messages
+                    WHERE quiz_id NOT IN (SELECT id FROM quiz_data)
+                    LIMIT ?
+                ''', (batch_size,))]
+                conn.executemany('DELETE FROM quiz_messages WHERE message_id = ?', ((message_id,) for message_id in message_ids))
+        for message_id in message_ids:
+            self.message_cache.invalidate(message_id)
+        return message_ids
+    
+    def prune_attempt_batch(self, guild_id: int, before: str, batch_size: int = 500) -> int:
+        # Deletes up to batch_size of the guild's attempts older than before.
+        # quiz_stats_daily and quiz_score_histogram already count every
+        # attempt, so only the per-question answers are rolled up here, in
+        # the same transaction as the delete.
+        if self.remote:
+            return self.remote.call('prune_attempt_batch', guild_id, before, batch_size)
+        with self.pool.writer() as conn, conn:
+            rows = conn.execute('''
+                SELECT id, quiz_id, timestamp, answers, correct_mask FROM quiz_logs
+                WHERE guild_id = ? AND timestamp < ?
+                ORDER BY timestamp
+                LIMIT ?
+            ''', (guild_id, before, batch_size)).fetchall()
+            
+            rollup = {}
+            for row in rows:
+                if row['answers'] is None:
+                    continue
+                day = row['timestamp'][:10]
+                correct_mask = row['correct_mask'] or 0
+                for question, option in enumerate(row['answers']):
+                    counts = rollup.setdefault((row['quiz_id'], day, question, option), [0, 0])
+                    counts[0] += 1
+                    counts[1] += (correct_mask >> question) & 1
+            
+            conn.executemany('''
+                INSERT INTO quiz_answer_daily (quiz_id, day, question, option, picks, correct)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (quiz_id, day, question, option) DO UPDATE SET
+                    picks = picks + excluded.picks,
+                    correct = correct + excluded.correct
+            ''', [(*key, *counts) for key, counts in rollup.items()])
+            conn.executemany('DELETE FROM quiz_logs WHERE id = ?', ((row['id'],) for row in rows))
+        return len(rows)
+    
+    def enable_incremental_vacuum(self) -> bool:
+        # Databases created before auto_vacuum was set need one full VACUUM to
+        # switch modes. It rewrites the file and holds the writer meanwhile, so
+        # it only runs when the owner asks for it (/rolevia compact), never
+        # from run_maintenance.
+        if self.remote:
+            return self.remote.call('enable_incremental_vacuum', timeout=None)
+        with self.pool.writer() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return False
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        return True
+    
+    def incremental_vacuum_enabled(self) -> bool:
+        with self.pool.reader() as conn:
+            # A pooled reader keeps the mode it saw when it opened until a query
+            # makes it reread the file header, e.g. after /rolevia compact
+            conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    
+    def incremental_vacuum(self, pages: int = 1000) -> int:
+        # Returns the bytes released from the file by this step
+        if self.remote:
+            return self.remote.call('incremental_vacuum', pages)
+        with self.pool.writer() as conn:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            before = conn.execute('PRAGMA page_count').fetchone()[0]
+            # The pragma frees one page per result row, so every row must be fetched
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+            after = conn.execute('PRAGMA page_count').fetchone()[0]
+        return (before - after) * page_size
+    
+    def run_maintenance(
+        self,
+        guild_ids: List[int],
+        default_retention_days: Optional[int] = None,
+        vacuum: bool = True,
+        batch_size: int = 500,
+        pause: float = 0.05
+    ) -> Dict[str, int]:
+        # Every step is a series of short write transactions with a pause in
+        # between, so attempt-log flushes and quiz saves are never queued
+        # behind the whole job
+        report = {'guilds': 0, 'attempts_pruned': 0, 'messages_removed': 0, 'bytes_reclaimed': 0, 'incremental_vacuum': False}
+        now = time.time()
+        for guild_id in guild_ids:
+            days = self.get_retention_days(guild_id)
+            if days is None:
+                days = default_retention_days
+            if not days:
+                continue
+            before = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - days * 86400))
+            pruned = 0
+            while True:
+                deleted = self.prune_attempt_batch(guild_id, before, batch_size)
+                pruned += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+            if pruned:
+                report['guilds'] += 1
+                report['attempts_pruned'] += pruned
         
-        row = cursor.fetchone()
-        return row['quiz_id'] if row else None
+        if vacuum:
+            while True:
+                deleted = len(self.delete_orphaned_quiz_messages(batch_size))
+                report['messages_removed'] += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+            # Files still in auto_vacuum=NONE are left alone until converted
+            report['incremental_vacuum'] = self.incremental_vacuum_enabled()
+            while report['incremental_vacuum']:
+                reclaimed = self.incremental_vacuum()
+                report['bytes_reclaimed'] += reclaimed
+                if not reclaimed:
+                    break
+                time.sleep(pause)
+        return report
+    
+    def health_check(self) -> Dict[str, Any]:
+        result = self.pool.health_check()
+        if self.remote:
+            try:
+                result['writer'] = self.remote.call('ping')
+                result['journal_mode'] = 'remote writer'
+            except sqlite3.Error:
+                result['writer'] = False
+        return result
+    
+    def enable_profiling(self, slow_ms: float = 50.0) -> QueryProfiler:
+        profiler = QueryProfiler(slow_ms)
+        self.pool.set_profiler(profiler)
+        return profiler
+    
+    def disable_profiling(self):
+        self.pool.set_profiler(None)
+    
+    def profile_report(self, limit: int = 20, order: str = 'total') -> Optional[Dict[str, Any]]:
+        # Per-statement totals plus per-method wall time, or None when profiling is off
+        profiler = self.pool.profiler
+        if profiler is None:
+            return None
+        return {
+            'statements': profiler.report(limit, order),
+            'slow': list(profiler.slow_log),
+            'methods': {
+                dict(labels)['method']: summary
+                for labels, summary in metrics.summary('rolevia_db_seconds').items()
+            }
+        }
+    
+    def close(self):
+        self.attempt_log.close()
+        self.pool.close()
+        if self.remote:
+            self.remote.close()
+
+# Every public Database method is timed under rolevia_db_seconds{method=...}
+metrics.instrument(Database, 'rolevia_db_seconds')
+
+class AsyncDatabase:
+    # Awaitable wrapper around Database. Calls run on a small thread pool sized
+    # to the connection pool, so sqlite never blocks the event loop. Writes are
+    # still serialized by the pool's single writer connection.
+    def __init__(self, database: Database):
+        self.database = database
+        self.executor = ThreadPoolExecutor(
+            max_workers=database.pool.max_readers + 1,
+            thread_name_prefix="rolevia-db"
+        )
+        # Maintenance sleeps between its batches, so it gets its own thread
+        # instead of holding one of the request threads for the whole job
+        self.maintenance_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="rolevia-maintenance"
+        )
+    
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    async def save_quiz(self, guild_id: int, questions: List[Dict], role_id: int, passing_percentage: int) -> int:
+        return await self._run(self.database.save_quiz, guild_id, questions, role_id, passing_percentage)
+    
+    async def save_quizzes(self, guild_id: int, quizzes: List[Dict]) -> List[int]:
+        return await self._run(self.database.save_quizzes, guild_id, quizzes)
+    
+    async def get_guild_quizzes(self, guild_id: int) -> List[Dict]:
+        return await self._run(self.database.get_guild_quizzes, guild_id)
+    
+    async def get_quiz(self, quiz_id: int) -> Optional[Dict]:
+        # Cold path, see Database.get_quiz
+        return await self._run(self.database.get_quiz, quiz_id)
+    
+    async def get_compiled_quiz(self, quiz_id: int) -> Optional[CompiledQuiz]:
+        # Cache hits skip the executor hop entirely
+        quiz = self.database.quiz_cache.get(quiz_id)
+        if quiz is not None:
+            return quiz
+        return await self._run(self.database.load_compiled_quiz, quiz_id)
+    
+    async def set_log_channel(self, guild_id: int, channel_id: int):
+        return await self._run(self.database.set_log_channel, guild_id, channel_id)
+    
+    async def get_log_channel(self, guild_id: int) -> Optional[int]:
+        # Served from the in-memory guild settings, no SQL involved
+        return self.database.get_log_channel(guild_id)
+    
+    async def set_webhook_url(self, guild_id: int, webhook_url: str):
+        return await self._run(self.database.set_webhook_url, guild_id, webhook_url)
+    
+    async def get_webhook_url(self, guild_id: int) -> Optional[str]:
+        return self.database.get_webhook_url(guild_id)
+    
+    async def set_retention_days(self, guild_id: int, days: Optional[int]):
+        return await self._run(self.database.set_retention_days, guild_id, days)
+    
+    async def get_retention_days(self, guild_id: int) -> Optional[int]:
+        return self.database.get_retention_days(guild_id)
+    
+    async def get_state(self, key: str) -> Optional[str]:
+        return await self._run(self.database.get_state, key)
+    
+    async def set_state(self, key: str, value: str):
+        return await self._run(self.database.set_state, key, value)
+    
+    async def log_quiz_attempt(self, guild_id: int, user_id: int, quiz_id: int, score: int, total_questions: int, passed: bool, answers: Optional[bytes] = None, correct_mask: Optional[int] = None):
+        # Only enqueues into the write-behind buffer, so no executor hop is needed
+        self.database.log_quiz_attempt(guild_id, user_id, quiz_id, score, total_questions, passed, answers, correct_mask)
+    
+    async def get_quiz_stats(self, quiz_id: int) -> Dict[str, Any]:
+        return await self._run(self.database.get_quiz_stats, quiz_id)
+    
+    async def get_question_difficulty(self, quiz: CompiledQuiz) -> Dict[str, Any]:
+        return await self._run(self.database.get_question_difficulty, quiz)
+    
+    async def get_quiz_logs(self, guild_id: int, limit: int = 50) -> List[Dict]:
+        return await self._run(self.database.get_quiz_logs, guild_id, limit)
+    
+    async def get_quiz_logs_page(
+        self,
+        guild_id: int,
+        user_id: Optional[int] = None,
+        quiz_id: Optional[int] = None,
+        passed: Optional[bool] = None,
+        before: Optional[Tuple[str, int]] = None,
+        after: Optional[Tuple[str, int]] = None,
+        limit: int = 10
+    ) -> Tuple[List[Dict], bool]:
+        return await self._run(self.database.get_quiz_logs_page, guild_id, user_id, quiz_id, passed, before, after, limit)
+    
+    async def save_quiz_message(self, message_id: int, channel_id: int, guild_id: int, quiz_id: int):
+        return await self._run(self.database.save_quiz_message, message_id, channel_id, guild_id, quiz_id)
+    
+    async def save_quiz_messages(self, rows: List[tuple]):
+        return await self._run(self.database.save_quiz_messages, rows)
+    
+    async def create_role_grant(self, guild_id: int, user_id: int, role_id: int, quiz_id: Optional[int] = None) -> int:
+        return await self._run(self.database.create_role_grant, guild_id, user_id, role_id, quiz_id)
+    
+    async def update_role_grant(self, grant_id: int, status: str, attempts: int, last_error: Optional[str] = None):
+        return await self._run(self.database.update_role_grant, grant_id, status, attempts, last_error)
+    
+    async def get_pending_role_grants(self) -> List[Dict]:
+        return await self._run(self.database.get_pending_role_grants)
+    
+    async def get_quiz_from_message(self, message_id: int) -> Optional[int]:
+        # Index hits skip the executor hop entirely
+        quiz_id = self.database.message_cache.get(message_id)
+        if quiz_id is not None:
+            return quiz_id
+        return await self._run(self.database.get_quiz_from_message, message_id)
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return self.database.cache_stats()
+    
+    def is_quiz_message(self, message_id: int) -> bool:
+        # In-memory only, cheap enough for every message delete event
+        return message_id in self.database.message_cache
+    
+    def attempt_log_stats(self) -> Dict[str, Any]:
+        return self.database.attempt_log_stats()
+    
+    async def delete_quiz_messages(self, message_ids: List[int]):
+        return await self._run(self.database.delete_quiz_messages, message_ids)
+    
+    async def enable_incremental_vacuum(self) -> bool:
+        return await self._run(self.database.enable_incremental_vacuum)
+    
+    async def run_maintenance(self, guild_ids: List[int], default_retention_days: Optional[int] = None, vacuum: bool = True) -> Dict[str, int]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.maintenance_executor,
+            partial(self.database.run_maintenance, guild_ids, default_retention_days, vacuum)
+        )
+    
+    async def health_check(self) -> Dict[str, Any]:
+        return await self._run(self.database.health_check)
+    
+    async def enable_profiling(self, slow_ms: float = 50.0) -> QueryProfiler:
+        return await self._run(self.database.enable_profiling, slow_ms)
+    
+    async def disable_profiling(self):
+        await self._run(self.database.disable_profiling)
+    
+    def profile_report(self, limit: int = 20, order: str = 'total') -> Optional[Dict[str, Any]]:
+        return self.database.profile_report(limit, order)
+    
+    def close(self):
+        self.maintenance_executor.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.database.close()
+
+# Global database instances, opened on first access (`from database import
+# async_db`) rather than on import, so tools and benchmarks that only need the
+# classes never create rolevia.db. Cluster processes get ROLEVIA_WRITER_SOCKET
+# from cluster.py and open the file read-only.
+_globals_lock = threading.Lock()
 
-# Global database instance
-db = Database()
+def __getattr__(name: str):
+    if name not in ('db', 'async_db'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _globals_lock:
+        if 'async_db' not in globals():
+            db = Database(
+                os.environ.get('ROLEVIA_DB', 'rolevia.db'),
+                writer_socket=os.environ.get('ROLEVIA_WRITER_SOCKET')
+            )
+            globals().update(db=db, async_db=AsyncDatabase(db))
+    return globals()[name]
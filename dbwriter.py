@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import signal
+import socket
+import sqlite3
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+# Database methods a cluster process may ask the writer to run. Everything
+# else, reads included, stays in the calling process.
+WRITE_METHODS = frozenset({
+    'save_quiz',
+    'save_quizzes',
+    'set_log_channel',
+    'set_webhook_url',
+    'set_state',
+    'save_quiz_message',
+    'save_quiz_messages',
+    'create_role_grant',
+    'update_role_grant',
+    'write_attempt_batch',
+    'set_retention_days',
+    'delete_quiz_messages',
+    'delete_orphaned_quiz_messages',
+    'prune_attempt_batch',
+    'enable_incremental_vacuum',
+    'incremental_vacuum',
+})
+
+HEADER = struct.Struct('>I')
+_DEFAULT_TIMEOUT = object()
+MAX_FRAME = 64 * 1024 * 1024
+
+def _default(value: Any):
+    if isinstance(value, (bytes, bytearray)):
+        return {'$b': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f'{type(value).__name__} cannot be sent to the writer')
+
+def _object_hook(value: dict):
+    if len(value) == 1 and '$b' in value:
+        return base64.b64decode(value['$b'])
+    return value
+
+def encode(message: dict) -> bytes:
+    # Length-prefixed JSON; bytes (quiz answers) travel as base64
+    body = json.dumps(message, default=_default, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(len(body)) + body
+
+def decode(body: bytes) -> dict:
+    return json.loads(body, object_hook=_object_hook)
+
+def _remote_error(error_type: str, message: str) -> sqlite3.Error:
+    # Writer-side sqlite errors are raised again as the same sqlite3 class
+    cls = getattr(sqlite3, error_type, None)
+    if not (isinstance(cls, type) and issubclass(cls, sqlite3.Error)):
+        cls = sqlite3.DatabaseError
+    return cls(message)
+
+class WriterClient:
+    # Blocking client used by Database in cluster processes. Each thread keeps
+    # its own socket, so executor threads and the attempt-log thread never
+    # interleave frames. Connection failures surface as sqlite3.OperationalError
+    # so callers handle them like a busy database.
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sockets = set()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.local.sock = sock
+        with self.lock:
+            self.sockets.add(sock)
+        return sock
+
+    def _recv_exact(self, sock: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('Writer closed the connection')
+            data += chunk
+        return bytes(data)
+
+    def call(self, method: str, *args, timeout: Any = _DEFAULT_TIMEOUT) -> Any:
+        # timeout=None waits as long as the writer needs, e.g. for a full VACUUM
+        frame = encode({'method': method, 'args': args})
+        wait = self.timeout if timeout is _DEFAULT_TIMEOUT else timeout
+        try:
+            sock = getattr(self.local, 'sock', None) or self._connect()
+            sock.settimeout(wait)
+            try:
+                sock.sendall(frame)
+            except OSError:
+                # Stale socket from a restarted writer: reconnect once. Nothing
+                # was read by the writer, so the call is not repeated.
+                self.close_thread()
+                sock = self._connect()
+                sock.settimeout(wait)
+                sock.sendall(frame)
+            size, = HEADER.unpack(self._recv_exact(sock, HEADER.size))
+            response = decode(self._recv_exact(sock, size))
+        except (OSError, ConnectionError) as exc:
+            self.close_thread()
+            raise sqlite3.OperationalError(f'Database writer unavailable: {exc}') from exc
+
+        if 'error' in response:
+            raise _remote_error(response.get('type', ''), response['error'])
+        return response.get('result')
+
+    def close_thread(self):
+        sock = getattr(self.local, 'sock', None)
+        self.local.sock = None
+        if sock is not None:
+            with self.lock:
+                self.sockets.discard(sock)
+            try:
+                sock.close()
+            except OSError:
+                pass
+    
+    def close(self):
+        with self.lock:
+            sockets, self.sockets = self.sockets, set()
+        for sock in sockets:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+class WriterServer:
+    # Owns the only writable connection to the database for a whole cluster.
+    # Requests are executed one at a time on a single thread, in arrival order.
+    def __init__(self, database, socket_path: str):
+        self.database = database
+        self.socket_path = socket_path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rolevia-writer')
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections = set()
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        # Only processes running as the same user may write
+        os.chmod(self.socket_path, 0o600)
+
+    def execute(self, method: str, args: list) -> Any:
+        return getattr(self.database, method)(*args)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        self.connections.add(writer)
+        try:
+            while True:
+                try:
+                    size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                if size > MAX_FRAME:
+                    return
+                request = decode(await reader.readexactly(size))
+                method = request.get('method')
+                self.requests += 1
+
+                if method == 'ping':
+                    response = {'result': True}
+                elif method not in WRITE_METHODS:
+                    response = {'error': f'{method} is not a writer method', 'type': 'ProgrammingError'}
+                else:
+                    try:
+                        result = await loop.run_in_executor(self.executor, self.execute, method, request.get('args', []))
+                        response = {'result': result}
+                    except sqlite3.Error as exc:
+                        self.errors += 1
+                        response = {'error': str(exc), 'type': type(exc).__name__}
+                    except Exception as exc:
+                        self.errors += 1
+                        print(f'Writer request {method} failed: {exc.__class__.__name__}: {exc}')
+                        response = {'error': str(exc), 'type': 'DatabaseError'}
+
+                writer.write(encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
+        self.executor.shutdown(wait=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+async def serve(database, socket_path: str, stop: Optional[asyncio.Event] = None):
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+    server = WriterServer(database, socket_path)
+    await server.start()
+    print(f'Database writer listening on {socket_path}')
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        database.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the single database writer for a rolevia cluster.")
+    parser.add_argument('--socket', default='rolevia-writer.sock')
+    parser.add_argument('--db', default='rolevia.db')
+    args = parser.parse_args()
+
+    # The writer serves the module-level database, which must be opened writable
+    os.environ['ROLEVIA_DB'] = args.db
+    os.environ.pop('ROLEVIA_WRITER_SOCKET', None)
+    from database import db
+    try:
+        asyncio.run(serve(db, args.socket))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import TYPE_CHECKING, BinaryIO, Tuple
+
+if TYPE_CHECKING:
+    # Imported lazily: importing database opens the module-level db
+    from database import Database
+
+EXPORT_COLUMNS = ['id', 'guild_id', 'user_id', 'quiz_id', 'score', 'total_questions', 'passed', 'timestamp', 'answers', 'correct_mask']
+
+def _export_row(row: dict) -> dict:
+    answers = row.get('answers')
+    return {
+        **{column: row.get(column) for column in EXPORT_COLUMNS},
+        'passed': bool(row['passed']),
+        # One chosen option per question, written as a readable list
+        'answers': list(answers) if answers is not None else None
+    }
+
+def export_quiz_logs(database: 'Database', guild_id: int, fmt: str = 'csv', compress: bool = False, page_size: int = 1000, spool_size: int = 8 * 1024 * 1024) -> Tuple[BinaryIO, int]:
+    # Streams the guild's quiz_logs into a spooled temp file (kept in memory up
+    # to spool_size, then on disk) and returns it rewound along with the row count.
+    output = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    raw = gzip.GzipFile(fileobj=output, mode='wb') if compress else output
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    
+    rows = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(text, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for row in database.iter_quiz_logs(guild_id, page_size):
+            record = _export_row(row)
+            if record['answers'] is not None:
+                record['answers'] = ' '.join(map(str, record['answers']))
+            writer.writerow(record)
+            rows += 1
+    elif fmt == 'jsonl':
+        for row in database.iter_quiz_logs(guild_id, page_size):
+            text.write(json.dumps(_export_row(row)))
+            text.write('\n')
+            rows += 1
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    
+    # Detach so closing the wrappers finishes the gzip stream without closing the spool
+    text.flush()
+    text.detach()
+    if compress:
+        raw.close()
+    output.seek(0)
+    return output, rows
+
+def export_filename(guild_id: int, fmt: str, compress: bool) -> str:
+    return f"quiz_logs_{guild_id}.{fmt}" + (".gz" if compress else "")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a guild's quiz attempt logs as CSV or JSONL.")
+    parser.add_argument('guild_id', type=int)
+    parser.add_argument('--db', default='rolevia.db', help="Path to the rolevia database")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip")
+    parser.add_argument('--page-size', type=int, default=5000)
+    parser.add_argument('-o', '--output', help="Output file (defaults to quiz_logs_<guild>.<format>, '-' for stdout)")
+    args = parser.parse_args()
+    
+    # The tool uses the module-level database, so it must point at --db before
+    # database is first imported
+    os.environ['ROLEVIA_DB'] = args.db
+    from database import db as database
+    try:
+        exported, rows = export_quiz_logs(database, args.guild_id, args.format, args.gzip, args.page_size)
+    finally:
+        database.close()
+    
+    with exported:
+        if args.output == '-':
+            shutil.copyfileobj(exported, sys.stdout.buffer)
+        else:
+            path = args.output or export_filename(args.guild_id, args.format, args.gzip)
+            with open(path, 'wb') as handle:
+                shutil.copyfileobj(exported, handle)
+            print(f"Exported {rows} rows to {path}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
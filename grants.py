@@ -0,0 +1,159 @@
+import asyncio
+import random
+import discord
+from typing import Dict, Optional, Set, Tuple
+from database import async_db
+
+class RoleGrant:
+    __slots__ = ('id', 'guild_id', 'user_id', 'role_id', 'attempts')
+    
+    def __init__(self, grant_id: int, guild_id: int, user_id: int, role_id: int, attempts: int = 0):
+        self.id = grant_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.role_id = role_id
+        self.attempts = attempts
+
+class RoleGrantQueue:
+    # One worker per guild feeds PUT /guilds/{guild}/members/{user}/roles/{role},
+    # which shares a per-guild rate-limit bucket. Requests are paced, retried
+    # with backoff on 429/5xx, and every outcome is stored in role_grants. A grant
+    # waiting to be retried is put back on the queue when its backoff ends, so the
+    # rest of the guild's grants keep flowing meanwhile.
+    def __init__(self, bot: discord.Client, interval: float = 0.25, max_attempts: int = 5, base_delay: float = 2.0):
+        self.bot = bot
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.queues: Dict[int, asyncio.Queue] = {}
+        self.workers: Dict[int, asyncio.Task] = {}
+        self.queued: Set[Tuple[int, int, int]] = set()
+        self.retry_handles: Set[asyncio.TimerHandle] = set()
+        self.granted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.retried = 0
+    
+    async def submit(self, guild_id: int, user_id: int, role_id: int, quiz_id: Optional[int] = None) -> bool:
+        key = (guild_id, user_id, role_id)
+        if key in self.queued:
+            # Coalesce repeated passes while a grant for the same role is still queued
+            return False
+        grant_id = await async_db.create_role_grant(guild_id, user_id, role_id, quiz_id)
+        self._enqueue(RoleGrant(grant_id, guild_id, user_id, role_id))
+        return True
+    
+    def _owns_guild(self, guild_id: int) -> bool:
+        # In a cluster each process only replays grants for guilds on its own shards
+        shard_ids = getattr(self.bot, 'shard_ids', None)
+        shard_count = getattr(self.bot, 'shard_count', None)
+        if not shard_ids or not shard_count:
+            return True
+        return (guild_id >> 22) % shard_count in shard_ids
+    
+    async def replay(self) -> int:
+        rows = await async_db.get_pending_role_grants()
+        replayed = 0
+        for row in rows:
+            grant = RoleGrant(row['id'], row['guild_id'], row['user_id'], row['role_id'], row['attempts'])
+            if not self._owns_guild(grant.guild_id):
+                continue
+            if (grant.guild_id, grant.user_id, grant.role_id) in self.queued:
+                await async_db.update_role_grant(grant.id, 'skipped', grant.attempts, 'duplicate')
+                continue
+            self._enqueue(grant)
+            replayed += 1
+        return replayed
+    
+    def _enqueue(self, grant: RoleGrant):
+        self.queued.add((grant.guild_id, grant.user_id, grant.role_id))
+        queue = self.queues.get(grant.guild_id)
+        if queue is None:
+            queue = self.queues[grant.guild_id] = asyncio.Queue()
+            self.workers[grant.guild_id] = asyncio.create_task(self._worker(grant.guild_id, queue))
+        queue.put_nowait(grant)
+    
+    async def _worker(self, guild_id: int, queue: asyncio.Queue):
+        while True:
+            grant = await queue.get()
+            done = True
+            try:
+                done = await self._process(grant)
+            except Exception as exc:
+                print(f'Role grant {grant.id} crashed: {exc.__class__.__name__}: {exc}')
+            finally:
+                if done:
+                    self.queued.discard((grant.guild_id, grant.user_id, grant.role_id))
+                queue.task_done()
+            await asyncio.sleep(self.interval)
+    
+    def _already_has_role(self, grant: RoleGrant) -> bool:
+        guild = self.bot.get_guild(grant.guild_id)
+        member = guild.get_member(grant.user_id) if guild else None
+        return member is not None and any(role.id == grant.role_id for role in member.roles)
+    
+    def _retry_later(self, grant: RoleGrant, delay: float):
+        loop = asyncio.get_running_loop()
+        
+        def requeue():
+            self.retry_handles.discard(handle)
+            queue = self.queues.get(grant.guild_id)
+            if queue is not None:
+                queue.put_nowait(grant)
+        
+        handle = loop.call_later(delay, requeue)
+        self.retry_handles.add(handle)
+    
+    async def _process(self, grant: RoleGrant) -> bool:
+        # Returns False when the grant was scheduled for another attempt
+        if self._already_has_role(grant):
+            self.skipped += 1
+            await async_db.update_role_grant(grant.id, 'skipped', grant.attempts, 'already has role')
+            return True
+        
+        grant.attempts += 1
+        try:
+            await self.bot.http.add_role(grant.guild_id, grant.user_id, grant.role_id, reason="Passed a Rolevia quiz")
+        except (discord.Forbidden, discord.NotFound) as exc:
+            # Missing permissions or a deleted member/role won't fix itself
+            self.failed += 1
+            await async_db.update_role_grant(grant.id, 'failed', grant.attempts, f'{exc.status} {exc.text}')
+            return True
+        except (discord.HTTPException, asyncio.TimeoutError, OSError) as exc:
+            error = f'{exc.status} {exc.text}' if isinstance(exc, discord.HTTPException) else str(exc)
+            if grant.attempts >= self.max_attempts:
+                self.failed += 1
+                await async_db.update_role_grant(grant.id, 'failed', grant.attempts, error)
+                return True
+            self.retried += 1
+            await async_db.update_role_grant(grant.id, 'pending', grant.attempts, error)
+            delay = self.base_delay * 2 ** (grant.attempts - 1)
+            self._retry_later(grant, delay + random.uniform(0, delay / 2))
+            return False
+        
+        self.granted += 1
+        await async_db.update_role_grant(grant.id, 'granted', grant.attempts)
+        return True
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': len(self.queued),
+            'guilds': len(self.queues),
+            'granted': self.granted,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'retried': self.retried,
+            'waiting_retry': len(self.retry_handles)
+        }
+    
+    async def close(self):
+        # Unfinished grants stay 'pending' in the database and are replayed on next start
+        for handle in self.retry_handles:
+            handle.cancel()
+        self.retry_handles.clear()
+        for task in self.workers.values():
+            task.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
+        self.queued.clear()
@@ -0,0 +1,106 @@
+import asyncio
+import discord
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+MAX_EMBEDS_PER_MESSAGE = 10
+
+class _GuildBuffer:
+    __slots__ = ('items', 'event', 'task')
+    
+    def __init__(self):
+        self.items: Deque[Tuple[int, discord.Embed]] = deque()
+        self.event = asyncio.Event()
+        self.task = None
+
+class LogDispatcher:
+    # Buffers log-channel embeds per guild and sends them as multi-embed
+    # messages, either once 10 are waiting or flush_interval after the first.
+    # One worker per guild keeps messages in submission order. When a guild's
+    # buffer is full, new embeds are dropped and counted instead of queued.
+    def __init__(self, bot: discord.Client, flush_interval: float = 2.0, max_buffer: int = 200):
+        self.bot = bot
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffers: Dict[int, _GuildBuffer] = {}
+        self.submitted = 0
+        self.sent_embeds = 0
+        self.sent_messages = 0
+        self.dropped = 0
+    
+    def submit(self, guild_id: int, channel_id: int, embed: discord.Embed) -> bool:
+        buffer = self.buffers.get(guild_id)
+        if buffer is None:
+            buffer = self.buffers[guild_id] = _GuildBuffer()
+        if buffer.task is None or buffer.task.done():
+            # Also replaces a worker that died, so its guild's logs don't pile up
+            buffer.task = asyncio.create_task(self._worker(buffer))
+        
+        if len(buffer.items) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        
+        buffer.items.append((channel_id, embed))
+        self.submitted += 1
+        buffer.event.set()
+        return True
+    
+    async def _worker(self, buffer: _GuildBuffer):
+        while True:
+            await buffer.event.wait()
+            buffer.event.clear()
+            if len(buffer.items) < MAX_EMBEDS_PER_MESSAGE:
+                # Give the batch time to fill up before sending a partial message
+                await asyncio.sleep(self.flush_interval)
+            await self._flush(buffer)
+    
+    def _take_batch(self, buffer: _GuildBuffer) -> Tuple[int, List[discord.Embed]]:
+        # A batch only spans one channel, in case the log channel changed mid-buffer
+        channel_id = buffer.items[0][0]
+        embeds = []
+        while buffer.items and len(embeds) < MAX_EMBEDS_PER_MESSAGE and buffer.items[0][0] == channel_id:
+            embeds.append(buffer.items.popleft()[1])
+        return channel_id, embeds
+    
+    async def _flush(self, buffer: _GuildBuffer):
+        while buffer.items:
+            channel_id, embeds = self._take_batch(buffer)
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                self.dropped += len(embeds)
+                continue
+            try:
+                await channel.send(embeds=embeds)
+            except discord.HTTPException as exc:
+                self.dropped += len(embeds)
+                print(f'Failed to send {len(embeds)} log embeds to {channel_id}: {exc.status} {exc.text}')
+                continue
+            except Exception as exc:
+                # Connection errors and timeouts that outlast discord.py's own retries
+                self.dropped += len(embeds)
+                print(f'Failed to send {len(embeds)} log embeds to {channel_id}: {exc.__class__.__name__}: {exc}')
+                continue
+            self.sent_embeds += len(embeds)
+            self.sent_messages += 1
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'buffered': sum(len(buffer.items) for buffer in self.buffers.values()),
+            'submitted': self.submitted,
+            'sent_embeds': self.sent_embeds,
+            'sent_messages': self.sent_messages,
+            'dropped': self.dropped
+        }
+    
+    async def close(self):
+        buffers = list(self.buffers.values())
+        for buffer in buffers:
+            buffer.task.cancel()
+        await asyncio.gather(*(buffer.task for buffer in buffers), return_exceptions=True)
+        # Best-effort final flush of whatever was still waiting
+        for buffer in buffers:
+            try:
+                await self._flush(buffer)
+            except Exception as exc:
+                print(f'Failed to flush quiz logs on shutdown: {exc}')
+        self.buffers.clear()
@@ -0,0 +1,280 @@
+import bisect
+import inspect
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds, from a cached lookup up to a slow REST call
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+def _summarize(histogram: _Histogram) -> Dict[str, Optional[float]]:
+    return {
+        'count': histogram.count,
+        'p50': histogram.quantile(0.5),
+        'p99': histogram.quantile(0.99),
+        'mean': histogram.total / histogram.count if histogram.count else None
+    }
+
+def _errors_name(name: str) -> str:
+    # rolevia_db_seconds -> rolevia_db_errors_total
+    return name[:-len('_seconds')] + '_errors_total' if name.endswith('_seconds') else name + '_errors_total'
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics: 'Metrics', name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.metrics.inc(_errors_name(self.name), error=exc_type.__name__, **self.labels)
+        return False
+
+class Metrics:
+    # Process-wide counters, histograms and gauges. Recording is a dict lookup
+    # and an add under one lock, cheap enough to leave on in production.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.help: Dict[str, str] = {}
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def series(self, name: str, **labels) -> _Histogram:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+        return histogram
+
+    def record(self, histogram: _Histogram, seconds: float):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            histogram.counts[index] += 1
+            histogram.total += seconds
+            histogram.count += 1
+
+    def observe(self, name: str, seconds: float, **labels):
+        self.record(self.series(name, **labels), seconds)
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        # Gauges are read when scraped, so they never go stale
+        self.gauges[name] = func
+
+    def timer(self, name: str, **labels) -> '_Timer':
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str, **labels):
+        # The series is resolved once here, so each call only pays for two
+        # perf_counter() reads and one locked add
+        histogram = self.series(name, **labels)
+        errors = _errors_name(name)
+
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as exc:
+                        self.inc(errors, error=type(exc).__name__, **labels)
+                        raise
+                    finally:
+                        self.record(histogram, time.perf_counter() - started)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception as exc:
+                    self.inc(errors, error=type(exc).__name__, **labels)
+                    raise
+                finally:
+                    self.record(histogram, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def instrument(self, cls, name: str):
+        # Times every public method of cls under one histogram, labelled by method.
+        # Generator methods are left alone since only their creation could be timed.
+        for attr, func in list(vars(cls).items()):
+            if attr.startswith('_') or not inspect.isfunction(func) or inspect.isgeneratorfunction(func):
+                continue
+            setattr(cls, attr, self.timed(name, method=attr)(func))
+        return cls
+
+    def summary(self, name: str) -> Dict[Labels, Dict[str, Optional[float]]]:
+        with self.lock:
+            series = dict(self.histograms.get(name, {}))
+        return {key: _summarize(histogram) for key, histogram in series.items()}
+    
+    def overall(self, name: str) -> Dict[str, Optional[float]]:
+        # One summary across every label set of a histogram
+        merged = _Histogram()
+        with self.lock:
+            for histogram in self.histograms.get(name, {}).values():
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.total += histogram.total
+                merged.count += histogram.count
+        return _summarize(merged)
+
+    def total(self, name: str) -> float:
+        with self.lock:
+            return sum(self.counters.get(name, {}).values())
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        def labels_text(key: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + '}'
+
+        with self.lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.total, h.count) for key, h in series.items()}
+                for name, series in self.histograms.items()
+            }
+
+        lines: List[str] = []
+        for name, series in sorted(counters.items()):
+            if name in self.help:
+                lines.append(f'# HELP {name} {self.help[name]}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in series.items():
+                lines.append(f'{name}{labels_text(key)} {value}')
+
+        for name, series in sorted(histograms.items()):
+            if name in self.help:
+                lines.append(f'# HELP {name} {self.help[name]}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, (counts, total, count) in series.items():
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS, counts):
+                    cumulative += bucket
+                    lines.append(f'{name}_bucket{labels_text(key, (("le", repr(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{labels_text(key, (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{labels_text(key)} {total}')
+                lines.append(f'{name}_count{labels_text(key)} {count}')
+
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            if name in self.help:
+                lines.append(f'# HELP {name} {self.help[name]}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+def instrument_http(client):
+    # Times every Discord REST call: the client's own requests and the
+    # interaction responses/followups, which go through the webhook adapter.
+    # discord.py and aiohttp are imported lazily so database.py and the
+    # offline tools can record metrics without them.
+    import discord.webhook.async_
+    
+    original_request = client.http.request
+
+    async def request(route, **kwargs):
+        with metrics.timer('rolevia_discord_request_seconds', method=route.method, route=route.path):
+            return await original_request(route, **kwargs)
+
+    client.http.request = request
+
+    adapter = discord.webhook.async_.async_context.get()
+    if getattr(adapter, 'instrumented', False):
+        return
+    original_adapter_request = adapter.request
+
+    async def adapter_request(route, *args, **kwargs):
+        with metrics.timer('rolevia_discord_request_seconds', method=route.method, route=route.path):
+            return await original_adapter_request(route, *args, **kwargs)
+
+    adapter.request = adapter_request
+    adapter.instrumented = True
+
+class MetricsServer:
+    # Optional local /metrics endpoint for a Prometheus scraper
+    def __init__(self, port: int, host: str = '127.0.0.1'):
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8', headers={'X-Content-Type-Options': 'nosniff'})
+
+    async def start(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics = Metrics()
+metrics.describe('rolevia_interaction_seconds', 'Bot.on_interaction dispatch time by route')
+metrics.describe('rolevia_interaction_errors_total', 'Interactions whose handler raised')
+metrics.describe('rolevia_db_seconds', 'Database method wall time')
+metrics.describe('rolevia_db_errors_total', 'Database methods that raised')
+metrics.describe('rolevia_discord_request_seconds', 'Discord REST call time, including rate-limit waits')
+metrics.describe('rolevia_discord_request_errors_total', 'Discord REST calls that raised')
+metrics.describe('rolevia_suppressed_errors_total', 'Errors the bot deliberately ignored, by place')
+metrics.describe('rolevia_maintenance_bytes_reclaimed_total', 'Bytes returned to the filesystem by incremental_vacuum')
+metrics.describe('rolevia_maintenance_attempts_pruned_total', 'quiz_logs rows removed by the retention policy')
+metrics.describe('rolevia_maintenance_messages_removed_total', 'Orphaned quiz_messages rows removed')
+metrics.describe('rolevia_attempts_dropped_total', 'Quiz attempts discarded after repeated non-transient write failures')
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+MAX_QUESTIONS = 20
+MAX_OPTIONS = 25
+MAX_DESCRIPTION_LENGTH = 4096
+
+class QuizFileError(Exception):
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+def _split(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return [part for part in str(value or '').split('|')]
+
+def _parse_json(data: bytes) -> List[Dict[str, Any]]:
+    document = json.loads(data)
+    if isinstance(document, dict) and 'quizzes' in document:
+        document = document['quizzes']
+    if isinstance(document, dict):
+        document = [document]
+    if not isinstance(document, list):
+        raise QuizFileError(["The file must contain a quiz object, a list of quizzes or {\"quizzes\": [...]}"])
+    return document
+
+def _parse_csv(data: bytes) -> List[Dict[str, Any]]:
+    # One row per question. Rows sharing the same `quiz` value form one quiz.
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8-sig')))
+    missing = {'quiz', 'role_id', 'passing_percentage', 'question', 'options', 'correct_answers'} - set(reader.fieldnames or [])
+    if missing:
+        raise QuizFileError([f"CSV is missing columns: {', '.join(sorted(missing))}"])
+    
+    quizzes: Dict[str, Dict[str, Any]] = {}
+    for row in reader:
+        quiz = quizzes.setdefault(row['quiz'], {
+            'role_id': row['role_id'],
+            'passing_percentage': row['passing_percentage'],
+            'questions': []
+        })
+        quiz['questions'].append({
+            'question': row['question'],
+            'options': row['options'],
+            'correct_answers': row['correct_answers'],
+            'imglink': row.get('imglink') or ''
+        })
+    return list(quizzes.values())
+
+def _valid_url(value: str) -> bool:
+    parsed = urlparse(value)
+    return parsed.scheme in ('http', 'https') and bool(parsed.netloc)
+
+def _normalize_question(raw: Any, where: str, errors: List[str]) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        errors.append(f"{where}: must be an object")
+        return {}
+    
+    text = str(raw.get('question') or '').strip()
+    if not text:
+        errors.append(f"{where}: question text is empty")
+    
+    options = [option.strip() for option in _split(raw.get('options'))]
+    if not 1 <= len(options) <= MAX_OPTIONS:
+        errors.append(f"{where}: needs between 1 and {MAX_OPTIONS} options, got {len(options)}")
+    if any(not option for option in options):
+        errors.append(f"{where}: options must not be empty")
+    
+    correct_answers = []
+    for answer in _split(raw.get('correct_answers')):
+        try:
+            number = int(str(answer).strip())
+        except ValueError:
+            errors.append(f"{where}: correct answer {answer!r} is not a number")
+            continue
+        if not 1 <= number <= len(options):
+            errors.append(f"{where}: correct answer {number} is not an option number (1-{len(options)})")
+        correct_answers.append(number)
+    if not correct_answers:
+        errors.append(f"{where}: needs at least one correct answer")
+    
+    imglink = str(raw.get('imglink') or '').strip()
+    if imglink and not _valid_url(imglink):
+        errors.append(f"{where}: image link {imglink!r} is not an http(s) URL")
+    
+    options_text = "\n".join(f"{i}. {option}" for i, option in enumerate(options, 1))
+    if len(f"**{text}**\n\n{options_text}") > MAX_DESCRIPTION_LENGTH:
+        errors.append(f"{where}: question and options are longer than {MAX_DESCRIPTION_LENGTH} characters")
+    
+    return {
+        'question': text,
+        'options': options,
+        'correct_answers': correct_answers,
+        'imglink': imglink
+    }
+
+def _normalize_quiz(raw: Any, where: str, errors: List[str]) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        errors.append(f"{where}: must be an object")
+        return {}
+    
+    try:
+        role_id = int(raw.get('role_id'))
+    except (TypeError, ValueError):
+        errors.append(f"{where}: role_id is missing or not a number")
+        role_id = None
+    
+    try:
+        passing_percentage = int(raw.get('passing_percentage', 70))
+        if not 0 <= passing_percentage <= 100:
+            errors.append(f"{where}: passing_percentage must be between 0 and 100")
+    except (TypeError, ValueError):
+        errors.append(f"{where}: passing_percentage is not a number")
+        passing_percentage = None
+    
+    questions = raw.get('questions')
+    if not isinstance(questions, list) or not 1 <= len(questions) <= MAX_QUESTIONS:
+        errors.append(f"{where}: needs a list of 1 to {MAX_QUESTIONS} questions")
+        questions = questions if isinstance(questions, list) else []
+    
+    return {
+        'role_id': role_id,
+        'passing_percentage': passing_percentage,
+        'questions': [
+            _normalize_question(question, f"{where} question {index}", errors)
+            for index, question in enumerate(questions, 1)
+        ]
+    }
+
+def parse_quiz_file(filename: str, data: bytes) -> List[Dict[str, Any]]:
+    # Parses and validates every quiz up front. Raises QuizFileError listing
+    # all problems, so nothing is saved unless the whole file is valid.
+    try:
+        if filename.lower().endswith('.csv'):
+            raw_quizzes = _parse_csv(data)
+        else:
+            raw_quizzes = _parse_json(data)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as exc:
+        raise QuizFileError([f"Could not read {filename}: {exc}"])
+    
+    if not raw_quizzes:
+        raise QuizFileError(["The file does not contain any quizzes"])
+    
+    errors: List[str] = []
+    quizzes = [_normalize_quiz(raw, f"Quiz {index}", errors) for index, raw in enumerate(raw_quizzes, 1)]
+    if errors:
+        raise QuizFileError(errors)
+    return quizzes
+
+def dump_quizzes(quizzes: List[Dict[str, Any]]) -> bytes:
+    # Output is accepted by parse_quiz_file, so a dump can be edited and re-imported
+    return json.dumps({
+        'quizzes': [
+            {
+                'id': quiz['id'],
+                'role_id': quiz['role_id'],
+                'passing_percentage': quiz['passing_percentage'],
+                'questions': quiz['questions']
+            }
+            for quiz in quizzes
+        ]
+    }, indent=2, ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,111 @@
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class _Entry:
+    __slots__ = ('value', 'expires_at')
+    
+    def __init__(self, value: Any, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+
+class _Claim:
+    __slots__ = ()
+    
+    def close(self):
+        pass
+
+_CLAIMED = _Claim()
+
+class SessionRegistry:
+    # Central store for in-flight interactive sessions. Values must provide a
+    # close() method, which is called when a session expires or is replaced.
+    # Expiry is driven by sweep(), so views can run without their own timers.
+    def __init__(self, ttl: float = 900, max_sessions: int = 10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.entries: Dict[Hashable, _Entry] = {}
+        self.created = 0
+        self.replaced = 0
+        self.expired = 0
+        self.rejected = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._expire(key, entry)
+            return None
+        return entry.value
+    
+    def start(self, key: Hashable, factory: Callable[[], Any]) -> Optional[Any]:
+        # Only one session per key: a new attempt replaces the previous one
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.replaced += 1
+            old.value.close()
+        
+        if len(self.entries) >= self.max_sessions:
+            self.sweep()
+            if len(self.entries) >= self.max_sessions:
+                self.rejected += 1
+                return None
+        
+        value = factory()
+        self.entries[key] = _Entry(value, time.monotonic() + self.ttl)
+        self.created += 1
+        return value
+    
+    def claim(self, key: Hashable) -> bool:
+        # One-shot marker: True for the first caller within ttl, False for
+        # repeats. Claims are tiny, so they are not held to max_sessions.
+        if self.get(key) is not None:
+            return False
+        self.entries[key] = _Entry(_CLAIMED, time.monotonic() + self.ttl)
+        return True
+    
+    def touch(self, key: Hashable) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        entry.expires_at = time.monotonic() + self.ttl
+        return True
+    
+    def end(self, key: Hashable, value: Any = None):
+        entry = self.entries.get(key)
+        # A replaced session must not end the one that replaced it
+        if entry is None or (value is not None and entry.value is not value):
+            return
+        del self.entries[key]
+        entry.value.close()
+    
+    def sweep(self) -> int:
+        now = time.monotonic()
+        expired = [(key, entry) for key, entry in self.entries.items() if entry.expires_at <= now]
+        for key, entry in expired:
+            self._expire(key, entry)
+        return len(expired)
+    
+    def _expire(self, key: Hashable, entry: _Entry):
+        if self.entries.get(key) is entry:
+            del self.entries[key]
+        self.expired += 1
+        entry.value.close()
+    
+    def close(self):
+        entries, self.entries = self.entries, {}
+        for entry in entries.values():
+            entry.value.close()
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'active': len(self.entries),
+            'max_sessions': self.max_sessions,
+            'created': self.created,
+            'replaced': self.replaced,
+            'expired': self.expired,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,39 @@
+import aiohttp
+import discord
+from typing import Dict, Optional, Tuple
+from database import async_db
+
+class WebhookManager:
+    # Owns one aiohttp session for the lifetime of the bot and keeps a
+    # Webhook object per guild, rebuilt only when the stored URL changes.
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.webhooks: Dict[int, Tuple[str, discord.Webhook]] = {}
+    
+    async def start(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+    
+    async def get(self, guild_id: int) -> Optional[discord.Webhook]:
+        webhook_url = await async_db.get_webhook_url(guild_id)
+        if not webhook_url:
+            self.webhooks.pop(guild_id, None)
+            return None
+        
+        cached = self.webhooks.get(guild_id)
+        if cached and cached[0] == webhook_url:
+            return cached[1]
+        
+        await self.start()
+        webhook = discord.Webhook.from_url(webhook_url, session=self.session)
+        self.webhooks[guild_id] = (webhook_url, webhook)
+        return webhook
+    
+    def invalidate(self, guild_id: int):
+        self.webhooks.pop(guild_id, None)
+    
+    async def close(self):
+        self.webhooks.clear()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None